@@ -5,26 +5,133 @@ Markdown 编辑器后端服务器
 提供 PDF 导出等后端功能
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, stream_with_context
+from urllib.parse import quote
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import markdown
-import tempfile
+import orjson
+import functools
+import hashlib
+import io
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
 
+class ORJSONProvider(DefaultJSONProvider):
+    """使用 orjson 序列化 JSON 响应（导出 HTML 时响应体较大）"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
-# 配置字体
-font_config = FontConfiguration()
+# 中文字体文件（建议使用 pyftsubset 子集化后的 Noto Sans CJK SC），不存在时回退到系统字体
+CJK_FONT_PATH = Path(os.getenv(
+    'CJK_FONT_PATH',
+    Path(__file__).resolve().parent / 'assets' / 'NotoSansCJKsc-sub.otf'
+))
+
+# 显式加载中文字体，避免每次渲染都在系统字体中逐个回退查找；
+# 必须写在页面自身的 <style> 中（作者样式），通过 stylesheets 传入的用户样式会被页面的 body 字体覆盖
+if CJK_FONT_PATH.is_file():
+    PDF_FONT_CSS = f"""
+                @font-face {{
+                    font-family: 'NotoCN';
+                    src: url('{CJK_FONT_PATH.as_uri()}');
+                }}
+                body {{
+                    font-family: 'NotoCN', -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', 'Helvetica Neue', Arial, sans-serif;
+                }}"""
+else:
+    PDF_FONT_CSS = ""
+
+# 配置字体（每个 PDF 渲染进程在 _init_pdf_worker 中各自初始化一次）
+font_config = None
+
+
+def _init_pdf_worker():
+    """PDF 渲染进程初始化：每个进程只构建一次字体配置"""
+    global font_config
+    font_config = FontConfiguration()
+
+
+def _render_pdf(full_html):
+    """在子进程中渲染 PDF，返回 PDF 字节"""
+    buf = io.BytesIO()
+    HTML(string=full_html).write_pdf(
+        buf,
+        font_config=font_config
+    )
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=256)
+def _md_to_html(content_hash, content):
+    """Markdown 转 HTML，按内容哈希缓存，自动保存/重复导出时跳过重新解析"""
+    return markdown.markdown(
+        content,
+        extensions=['codehilite', 'fenced_code', 'tables', 'toc']
+    )
+
+
+def markdown_to_html(content):
+    """转换 Markdown 为 HTML（带缓存）"""
+    content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+    return _md_to_html(content_hash, content)
+
+
+# PDF 流式输出的分块大小
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_bytes(data, chunk_size=PDF_CHUNK_SIZE):
+    """按固定大小分块输出字节"""
+    buf = io.BytesIO(data)
+    while chunk := buf.read(chunk_size):
+        yield chunk
+
+
+# WeasyPrint 渲染是 CPU 密集型的纯 Python 代码，放到进程池中绕开 GIL
+# 每个 gunicorn worker 各有一个进程池，总渲染进程数为 worker 数 × PDF_WORKERS
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '2'))
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool():
+    """首次导出时才创建进程池，确保渲染进程在 gunicorn fork 出 worker 之后启动"""
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    initializer=_init_pdf_worker
+                )
+    return _pdf_pool
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
+    cache_info = _md_to_html.cache_info()
     return jsonify({
         'status': 'ok',
-        'message': 'Markdown 编辑器后端服务运行正常'
+        'message': 'Markdown 编辑器后端服务运行正常',
+        'markdown_cache': {
+            'hits': cache_info.hits,
+            'misses': cache_info.misses,
+            'size': cache_info.currsize
+        }
     })
 
 @app.route('/api/export/pdf', methods=['POST'])
@@ -39,10 +146,7 @@ def export_pdf():
             return jsonify({'error': '内容不能为空'}), 400
         
         # 转换 Markdown 为 HTML
-        html_content = markdown.markdown(
-            markdown_content,
-            extensions=['codehilite', 'fenced_code', 'tables', 'toc']
-        )
+        html_content = markdown_to_html(markdown_content)
         
         # 创建完整的 HTML 文档
         full_html = f"""
@@ -109,7 +213,7 @@ def export_pdf():
                 @page {{
                     margin: 2cm;
                     size: A4;
-                }}
+                }}{PDF_FONT_CSS}
             </style>
         </head>
         <body>
@@ -118,19 +222,17 @@ def export_pdf():
         </html>
         """
         
-        # 生成 PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            HTML(string=full_html).write_pdf(
-                tmp_file.name,
-                font_config=font_config
-            )
-            
-            return send_file(
-                tmp_file.name,
-                as_attachment=True,
-                download_name=f'{title}.pdf',
-                mimetype='application/pdf'
-            )
+        # 生成 PDF（在进程池中渲染）
+        pdf_bytes = get_pdf_pool().submit(_render_pdf, full_html).result()
+        
+        return Response(
+            stream_with_context(_iter_bytes(pdf_bytes)),
+            mimetype='application/pdf',
+            headers={
+                'Content-Disposition': f"attachment; filename*=UTF-8''{quote(title + '.pdf')}",
+                'Content-Length': str(len(pdf_bytes))
+            }
+        )
             
     except Exception as e:
         return jsonify({'error': f'PDF 导出失败: {str(e)}'}), 500
@@ -147,10 +249,7 @@ def export_html():
             return jsonify({'error': '内容不能为空'}), 400
         
         # 转换 Markdown 为 HTML
-        html_content = markdown.markdown(
-            markdown_content,
-            extensions=['codehilite', 'fenced_code', 'tables', 'toc']
-        )
+        html_content = markdown_to_html(markdown_content)
         
         # 创建完整的 HTML 文档
         full_html = f"""
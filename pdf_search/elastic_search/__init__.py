@@ -2,6 +2,6 @@
 # Elasticsearch Module
 # =============================================================================
 
-from .es_client import ESClient
+from .es_client import ESClient, bulk_index
 
-__all__ = ["ESClient"]
+__all__ = ["ESClient", "bulk_index"]
@@ -1,26 +1,68 @@
+import os
+import random
 import time
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, ConnectionError as ESConnectionError
+from elasticsearch.helpers import parallel_bulk
 
 from config import ES_URL, ES_LOCAL_API_KEY
 
 
+def bulk_index(es, index, docs, chunk_size=500, thread_count=None, queue_size=4):
+    """Index documents in batches using parallel bulk requests.
+
+    Returns the number of indexed documents and the list of failed items.
+    """
+    actions = ({"_index": index, "_source": doc} for doc in docs)
+    success = 0
+    errors = []
+    for ok, item in parallel_bulk(
+        es,
+        actions,
+        chunk_size=chunk_size,
+        thread_count=thread_count or os.cpu_count(),
+        queue_size=queue_size,
+        raise_on_error=False,
+    ):
+        if ok:
+            success += 1
+        else:
+            errors.append(item)
+    return success, errors
+
+
 class ESClient:    
     def __init__(self):
         """Initialize Elasticsearch client with retry logic."""
-        self.es = None
-        while self.es is None:
+        self.es = self._connect()
+
+    @staticmethod
+    def _connect(max_attempts=6, initial_delay=0.25, max_delay=8):
+        """Connect to Elasticsearch, retrying with jittered exponential backoff."""
+        for attempt in range(max_attempts):
+            es = Elasticsearch(
+                [ES_URL],
+                api_key=ES_LOCAL_API_KEY,
+                http_compress=True,
+                request_timeout=60,
+                retry_on_timeout=True,
+                max_retries=3,
+            )
             try:
-                es = Elasticsearch(
-                    [ES_URL],
-                    api_key=ES_LOCAL_API_KEY,
-                )
-                self.es = es
-            except:
-                print("ElasticSearch conn failed, retry ...")
-                time.sleep(3)
-
-    def create_index(self, index, vector_dims=1024, metadata_fields=None):
-        """Create an Elasticsearch index with vector search capabilities."""
+                es.info()
+                return es
+            except ESConnectionError:
+                if attempt == max_attempts - 1:
+                    raise
+                delay = min(max_delay, initial_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"ElasticSearch conn failed, retry in {delay:.2f}s ...")
+                time.sleep(delay)
+
+    def create_index(self, index, vector_dims=1024, metadata_fields=None, vector_index_options=None):
+        """Create an Elasticsearch index with vector search capabilities.
+
+        vector_index_options is passed as the dense_vector index_options,
+        e.g. {"type": "int8_hnsw"} to quantize vectors (ES >= 8.11).
+        """
         # Check if index already exists and delete it first
         if self.index_exists(index):
             print(f"[Create Vector DB] Index {index} already exists, deleting first...")
@@ -42,6 +84,8 @@ class ESClient:
                 "index": True,
                 "similarity": "cosine"
             }
+            if vector_index_options:
+                mappings["properties"]["vector"]["index_options"] = vector_index_options
 
         # Add metadata fields if metadata_fields is set
         if metadata_fields:
@@ -71,6 +115,10 @@ class ESClient:
         """Index a single document."""
         self.es.index(index=index, body=body)
 
+    def bulk_index(self, index, docs, chunk_size=500):
+        """Index many documents with batched bulk requests."""
+        return bulk_index(self.es, index, docs, chunk_size=chunk_size)
+
     def search(self, index, query):
         """Perform search on the index."""
         return self.es.search(index=index, query=query)
@@ -2,19 +2,44 @@
 # Embedding Service
 # =============================================================================
 
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from config import EMBEDDING_URL
 
 
-def embedding(texts: list) -> list:
-    """Generate embeddings for input texts using the local embedding service."""
+# Number of texts sent to the embedding service per request
+BATCH_SIZE = 64
+# Max number of concurrent batch requests
+MAX_WORKERS = 8
+
+# Shared session so batches reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=64)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+
+def _post_batch(texts: list) -> list:
+    """Embed a single batch of texts."""
     headers = {"Content-Type": "application/json"}
     data = {"texts": texts}
-    
-    response = requests.post(EMBEDDING_URL, headers=headers, json=data)
+
+    response = _SESSION.post(EMBEDDING_URL, headers=headers, json=data)
     result = response.json()
-    
+
     return result["data"]["text_vectors"]
 
 
+def embedding(texts: list) -> list:
+    """Generate embeddings for input texts using the local embedding service."""
+    if len(texts) <= BATCH_SIZE:
+        return _post_batch(texts)
+
+    batches = [texts[i:i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(batches))) as executor:
+        results = list(executor.map(_post_batch, batches))
+
+    return [vector for vectors in results for vector in vectors]
@@ -1,21 +1,35 @@
 from faster_whisper import WhisperModel
-import json
+import ctranslate2
+import functools
+import orjson
 import os
 from utils import chunk_audio_segments
 
 
-def transcribe_audio(audio_file, json_path=None, model_size="large-v3", device="cpu", compute_type="int8", beam_size=3):
+@functools.lru_cache(maxsize=4)
+def _get_model(model_size, device, compute_type):
+    """Load a Whisper model once per (size, device, compute_type) and reuse it."""
+    return WhisperModel(model_size, device=device, compute_type=compute_type)
+
+
+def transcribe_audio(audio_file, json_path=None, model_size="large-v3", device=None, compute_type=None, beam_size=3, vad_filter=True):
     """Transcribe audio file to text using Faster Whisper."""
     
-    model = WhisperModel(model_size, device=device, compute_type=compute_type)
-    segments, info = model.transcribe(audio_file, beam_size=beam_size)
+    # Prefer GPU fp16 when CUDA is available, otherwise CPU int8
+    if device is None:
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    if compute_type is None:
+        compute_type = "float16" if device == "cuda" else "int8"
+    
+    model = _get_model(model_size, device, compute_type)
+    segments, info = model.transcribe(audio_file, beam_size=beam_size, vad_filter=vad_filter)
     
     lines = []
     json_file = os.path.join(json_path, os.path.basename(audio_file) + ".json") if json_path else None
     
     if json_file and os.path.exists(json_file):
-        with open(json_file, "r") as f:
-            lines = json.load(f)
+        with open(json_file, "rb") as f:
+            lines = orjson.loads(f.read())
         for line in lines:
             print("[%.2fs -> %.2fs] %s" % (line["start"], line["end"], line["text"]))
     else:
@@ -24,8 +38,8 @@ def transcribe_audio(audio_file, json_path=None, model_size="large-v3", device="
             print("[%.2fs -> %.2fs] %s" % (line["start"], line["end"], line["text"]))
             lines.append(line)
         if json_file:
-            with open(json_file, "w", encoding="utf-8") as f:
-                json.dump(lines, f, indent=2, ensure_ascii=False)
+            with open(json_file, "wb") as f:
+                f.write(orjson.dumps(lines, option=orjson.OPT_INDENT_2))
     
     metadata = {
         "language": info.language,
@@ -1,16 +1,38 @@
-import base64
+import functools
+import hashlib
 import logging
-import mimetypes
-import os
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import fitz
+import pybase64
 from openai import OpenAI
 
 from config import IMAGE_MODEL_URL, IMAGE_MODEL_API_KEY
 
 
+logger = logging.getLogger(__name__)
+
+# Max number of concurrent image summarization requests
+MAX_WORKERS = 16
+
+# Image summaries keyed by PNG content hash, shared across pages and documents
+_summary_cache = {}
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    """Shared OpenAI client, created on first use so .env can be loaded first."""
+    return OpenAI()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_image_client():
+    """Shared client for the image model endpoint."""
+    return OpenAI(api_key=IMAGE_MODEL_API_KEY, base_url=IMAGE_MODEL_URL)
+
+
 def context_augmentation(page_context, image_description):
     prompt = f"""
 目标：通过图片的上下文以及来源文件信息补充图片描述的细节，准确描述出图片在文档中的实际内容和用途含义。
@@ -42,8 +64,7 @@ def context_augmentation(page_context, image_description):
 {page_context}
 ```
 """
-    client = OpenAI()
-    response = client.chat.completions.create(
+    response = _get_client().chat.completions.create(
         model="gpt-5",
         messages=[
             {"role": "system", "content": "你是一个智能AI助手，根据图片的上下文对图片描述进行补充，补充后的描述要更加准确，更加详细，更加完整。"},
@@ -53,23 +74,18 @@ def context_augmentation(page_context, image_description):
     result = response.choices[0].message.content
     return result
 
-def summarize_image(image_path):
+def summarize_image(image_bytes, mime_type="image/png"):
     retry = 0
     while retry <= 5:
         try:
             text = f"""
 详细地描述这张图片的内容，不要漏掉细节，并提取图片中的文字。注意只需客观说明图片内容，无需进行任何评价。
 """
-            client = OpenAI(api_key=IMAGE_MODEL_API_KEY, base_url=IMAGE_MODEL_URL)
-
-            # Read local image and convert to Base64 data URL
-            with open(image_path, "rb") as f:
-                content_bytes = f.read()
-            mime_type = mimetypes.guess_type(image_path)[0] or "image/png"
-            encoded = base64.b64encode(content_bytes).decode("utf-8")
+            # Convert image bytes to Base64 data URL
+            encoded = pybase64.b64encode_as_string(image_bytes)
             data_url = f"data:{mime_type};base64,{encoded}"
             
-            resp = client.chat.completions.create(
+            resp = _get_image_client().chat.completions.create(
                 model="internvl-internlm2",
                 messages=[{
                     "role": "user",
@@ -86,22 +102,36 @@ def summarize_image(image_path):
             
             return resp.choices[0].message.content
         except Exception as e:
-            logging.error(traceback.format_exc())
-            logging.error(e)
+            logger.error(traceback.format_exc())
+            logger.error(e)
             time.sleep(1)
             retry += 1
             
     return None
 
 
+def _describe_image(page_num, img_index, image_path, image_hash, page_context):
+    try:
+        summary = _summary_cache.get(image_hash)
+        context_augmented_summary = context_augmentation(page_context, summary)
+        return {
+            "page_num": page_num,
+            "image_index": img_index + 1,
+            "summary": summary,
+            "image_path": image_path,
+            "page_context": page_context.strip(),
+            "context_augmented_summary": context_augmented_summary
+        }
+    except Exception as e:
+        logger.error("Error processing image %d on page %d: %s", img_index + 1, page_num + 1, e)
+        logger.error(traceback.format_exc())
+        return None
+
+
 def extract_images_from_pdf(pdf_path):
     pdf_document = fitz.open(pdf_path)
-    logging.info(f"Opened PDF document: {pdf_path}")
+    logger.info("Opened PDF document: %s", pdf_path)
 
-    image_dir = "pdf_images/"
-    os.makedirs(image_dir, exist_ok=True)
-    logging.info(f"Image directory created: {image_dir}")
-    
     unique_xrefs = set()
     for p in range(pdf_document.page_count):
         page_images = pdf_document.get_page_images(p)
@@ -114,9 +144,15 @@ def extract_images_from_pdf(pdf_path):
         pdf_document.close()
         return []
 
-    results = []
+    images = []
+    unique_images = {}
     processed_xrefs = set()
 
+    # Optional filter if available, resolved once per document
+    do_filter = globals().get("filter_meaningful_images")
+    if not callable(do_filter):
+        do_filter = None
+
     for page_num in range(pdf_document.page_count):
         try:
             page = pdf_document.load_page(page_num)
@@ -124,12 +160,12 @@ def extract_images_from_pdf(pdf_path):
 
             # Extract page text, 作为图片上下文
             page_text = page.get_text("dict", sort=True)
-            page_context = ""
-            for block in page_text["blocks"]:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            page_context += span["text"] + " "
+            page_context = " ".join(
+                span["text"]
+                for block in page_text["blocks"] if "lines" in block
+                for line in block["lines"]
+                for span in line["spans"]
+            )
             
             page_images = pdf_document.get_page_images(page_num)
             for img_index, item in enumerate(page_images):
@@ -150,45 +186,41 @@ def extract_images_from_pdf(pdf_path):
                     if pix.colorspace and pix.colorspace.name == "DeviceCMYK":
                         pix = fitz.Pixmap(fitz.csRGB, pix)
 
-                    image_save_path = f"{image_dir}/img_{page_num + 1}_{img_index + 1}.png"
-                    pix.save(image_save_path)
+                    # Keep the image in memory, the path is only a label for results
+                    image_path = f"pdf_images/img_{page_num + 1}_{img_index + 1}.png"
+                    image_bytes = pix.tobytes("png")
                     del pix
 
-                    # Optional filter if available
-                    do_filter = globals().get("filter_meaningful_images")
-                    if callable(do_filter):
-                        if not do_filter(image_save_path):
-                            os.remove(image_save_path)
-                            continue
-
-                    # Summarize single image
-                    summary = summarize_image(image_save_path)
-                    context_augmented_summary = context_augmentation(page_context, summary)
-                    results.append({
-                        "page_num": page_num,
-                        "image_index": img_index + 1,
-                        "summary": summary,
-                        "image_path": image_save_path,
-                        "page_context": page_context.strip(),
-                        "context_augmented_summary": context_augmented_summary
-                    })
-
-                    # Pretty print the latest result for readability
-                    # print("\n" + "=" * 60)
-                    # print(json.dumps(results[-1], ensure_ascii=False, indent=2))
-                    # Remove local copy after summarization
-                    try:
-                        os.remove(image_save_path)
-                    except Exception:
-                        pass
+                    if do_filter is not None and not do_filter(image_bytes):
+                        continue
+
+                    # Visually identical images under different xrefs share one summary
+                    image_hash = hashlib.blake2b(image_bytes, digest_size=16).digest()
+                    unique_images.setdefault(image_hash, image_bytes)
+                    images.append((page_num, img_index, image_path, image_hash, page_context))
 
                 except Exception as e:
-                    logging.error(f"Error processing image {img_index + 1} on page {page_num + 1}: {e}")
-                    logging.error(traceback.format_exc())
+                    logger.error("Error processing image %d on page %d: %s", img_index + 1, page_num + 1, e)
+                    logger.error(traceback.format_exc())
 
         except Exception as e:
-            logging.error(f"Error processing page {page_num + 1}: {e}")
-            logging.error(traceback.format_exc())
+            logger.error("Error processing page %d: %s", page_num + 1, e)
+            logger.error(traceback.format_exc())
 
     pdf_document.close()
-    return results
+
+    # MuPDF is not thread-safe, so only the LLM calls are fanned out
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = {
+            image_hash: executor.submit(summarize_image, image_bytes)
+            for image_hash, image_bytes in unique_images.items()
+            if image_hash not in _summary_cache
+        }
+        for image_hash, future in pending.items():
+            summary = future.result()
+            if summary is not None:
+                _summary_cache[image_hash] = summary
+
+        results = list(executor.map(lambda args: _describe_image(*args), images))
+
+    return [item for item in results if item is not None]
@@ -1,13 +1,19 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
 import fitz
 from openai import OpenAI
 
 from utils import truncate_text
 
 
-def table_context_augmentation(page_context: str, table_md: str):
-    """Augment the table description using page context to clarify meaning and usage."""
-    client = OpenAI()
-    prompt = f"""
+# Max number of concurrent table augmentation requests
+MAX_WORKERS = 16
+
+# Max characters of page text sent as table context
+MAX_CONTEXT_LENGTH = 2000
+
+TABLE_PROMPT = """
 目标：请根据输入的表格和上下文信息以及来源文件信息，生成针对于该表格的一段简短的语言描述
 
 注意：
@@ -28,7 +34,21 @@ def table_context_augmentation(page_context: str, table_md: str):
 {page_context}
 """
 
-    response = client.chat.completions.create(
+
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    """Shared OpenAI client, created on first use so .env can be loaded first."""
+    return OpenAI()
+
+
+def table_context_augmentation(page_context: str, table_md: str):
+    """Augment the table description using page context to clarify meaning and usage."""
+    prompt = TABLE_PROMPT.format(
+        table_md=table_md,
+        page_context=truncate_text(page_context, MAX_CONTEXT_LENGTH)
+    )
+
+    response = _get_client().chat.completions.create(
         model="gpt-5",
         messages=[
             {"role": "system", "content": "你是一个智能AI助手，根据表格的上下文对表格内容进行补充，补充后的内容要更加准确，更加详细，更加完整。"},
@@ -37,10 +57,24 @@ def table_context_augmentation(page_context: str, table_md: str):
     )
     return response.choices[0].message.content
 
+def _describe_table(page_num: int, table_index: int, md: str, page_text: str):
+    try:
+        augmented = table_context_augmentation(page_text, md)
+        return {
+            "page_num": page_num,
+            "table_index": table_index + 1,
+            "table_markdown": md,
+            "page_context": page_text.strip(),
+            "context_augmented_table": augmented
+        }
+    except Exception as e:
+        print(f"Error describing table {table_index + 1} on page {page_num + 1}: {e}")
+        return None
+
 def extract_tables_from_pdf(pdf_path: str):
     """Extract tables from PDF and generate context-augmented descriptions."""
     pdf_document = fitz.open(pdf_path)
-    results = []
+    tables = []
     
     for page_num in range(pdf_document.page_count):
         try:
@@ -50,35 +84,16 @@ def extract_tables_from_pdf(pdf_path: str):
 
             for table_index, table in enumerate(page_tables):
                 try:
-                    md = table.to_markdown()
-                    augmented = table_context_augmentation(page_text, md)
-                    
-                    item = {
-                        "page_num": page_num,
-                        "table_index": table_index + 1,
-                        "table_markdown": md,
-                        "page_context": page_text.strip(),
-                        "context_augmented_table": augmented
-                    }
-                    results.append(item)
-
-                    # # Markdown-styled pretty print for readability
-                    # md_output = (
-                    #     "\n" + "-" * 60 + "\n"
-                    #     + f"## 第 {page_num + 1} 页 · 表 {table_index + 1}\n\n"
-                    #     + "### 表格 (Markdown)\n"
-                    #     + "```markdown\n" + md + "\n```\n\n"
-                    #     + "### 上下文 (截断显示)\n"
-                    #     + "```text\n" + truncate_text(page_text, 1500) + "\n```\n\n"
-                    #     + "### 表格说明\n"
-                    #     + augmented + "\n"
-                    # )
-                    # print(md_output)
+                    tables.append((page_num, table_index, table.to_markdown(), page_text))
                 except Exception:
                     pass
         except Exception:
             pass
 
     pdf_document.close()
-    return results
 
+    # MuPDF is not thread-safe, so only the LLM calls are fanned out
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(lambda args: _describe_table(*args), tables))
+
+    return [item for item in results if item is not None]
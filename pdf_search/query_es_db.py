@@ -11,12 +11,14 @@ import sys
 import json
 from typing import List, Dict, Any
 
+from dotenv import load_dotenv
+
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from elastic_search import ESClient
 from rag.query import enhance_query
-from rag.retrieve import enhance_retrieve
+from rag.retrieve import enhance_retrieve_many
 from rag.web_search import ask_llm, bocha_web_search
 from openai import OpenAI
 from config import OPENAI_API_KEY
@@ -114,21 +116,19 @@ class ElasticsearchQueryInterface:
             return [query]  # Fallback to original query
     
     def retrieve_documents(self, queries: List[str]) -> Dict[str, List[Dict]]:
-        """Retrieve documents for each query."""
+        """Retrieve documents for all queries with one embedding call and one msearch."""
         print("📚 Retrieving documents...")
-        results = {}
-        
         for i, query in enumerate(queries, 1):
             print(f"  [{i}/{len(queries)}] Searching: {query[:50]}{'...' if len(query) > 50 else ''}")
-            try:
-                # Use chat history for coreference resolution in subsequent queries
-                chat_history = self.chat_session.get_chat_history_for_enhancement() if i > 1 else None
-                docs = enhance_retrieve(self.es_client.es, query, self.current_index, top_k=5)
-                results[query] = docs
-                print(f"    ✓ Found {len(docs)} documents")
-            except Exception as e:
-                print(f"    ❌ Failed to retrieve for query '{query}': {e}")
-                results[query] = []
+        
+        try:
+            results = enhance_retrieve_many(self.es_client.es, queries, self.current_index, top_k=5)
+        except Exception as e:
+            print(f"    ❌ Failed to retrieve documents: {e}")
+            return {query: [] for query in queries}
+        
+        for query, docs in results.items():
+            print(f"    ✓ Found {len(docs)} documents for '{query[:50]}'")
         
         return results
     
@@ -375,12 +375,7 @@ def load_environment():
     if os.path.exists(env_file):
         print("Loading environment variables from .env...")
         try:
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        os.environ[key.strip()] = value.strip()
+            load_dotenv(env_file, override=True)
             print("✓ Environment variables loaded")
         except Exception as e:
             print(f"⚠️  Warning: Failed to load .env file: {e}")
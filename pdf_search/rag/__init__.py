@@ -2,21 +2,27 @@
 # RAG Module
 # =============================================================================
 
-from .ingest import ingest_pdf, ingest_audio
-from .retrieve import elastic_search, rerank, enhance_retrieve
-from .query import rag_fusion, coreference_resolution, query_decompositon, enhance_query
+from .ingest import ingest_pdf, ingest_audio, build_pdf_documents, build_audio_documents
+from .retrieve import elastic_search, elastic_search_many, rerank, rerank_many, enhance_retrieve, enhance_retrieve_many
+from .query import rag_fusion, coreference_resolution, query_decompositon, enhance_query, enhance_query_async
 from .web_search import bocha_web_search, ask_llm
 
 __all__ = [
     "ingest_pdf",
     "ingest_audio",
+    "build_pdf_documents",
+    "build_audio_documents",
     "elastic_search",
+    "elastic_search_many",
     "rerank",
+    "rerank_many",
     "enhance_retrieve",
+    "enhance_retrieve_many",
     "rag_fusion",
     "coreference_resolution",
     "query_decompositon",
     "enhance_query",
+    "enhance_query_async",
     "bocha_web_search",
     "ask_llm"
 ]
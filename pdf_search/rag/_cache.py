@@ -0,0 +1,93 @@
+# =============================================================================
+# Exact-match Result Cache
+# =============================================================================
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+
+import diskcache
+
+
+CACHE_DIR = os.getenv("RAG_CACHE_DIR", "/tmp/rag_cache")
+CACHE_EXPIRE = 7 * 24 * 3600
+
+_cache = diskcache.Cache(CACHE_DIR)
+
+
+def _make_key(namespace, arguments):
+    """Hash the namespace (function + model) and call arguments into a cache key."""
+    payload = json.dumps([namespace, arguments], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached(namespace, ignore=("client",), expire=CACHE_EXPIRE):
+    """
+    Cache a function's results on disk, keyed by its arguments.
+
+    Args:
+        namespace (str): Cache namespace, should include the model id
+        ignore (tuple): Argument names excluded from the key
+        expire (int): Seconds before a cached result expires
+
+    Empty results (None, [], "") are not cached so failed calls are retried.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def key_for(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in ignore}
+            return _make_key(namespace, arguments)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = key_for(args, kwargs)
+                result = _cache.get(key)
+                if result is None:
+                    result = await func(*args, **kwargs)
+                    if result:
+                        _cache.set(key, result, expire=expire)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_for(args, kwargs)
+            result = _cache.get(key)
+            if result is None:
+                result = func(*args, **kwargs)
+                if result:
+                    _cache.set(key, result, expire=expire)
+            return result
+        return wrapper
+
+    return decorator
+
+
+def cached_batch(namespace, expire=CACHE_EXPIRE):
+    """
+    Cache a function mapping a list of items to a list of results, per item.
+
+    Only the items missing from the cache are passed to the function, in one call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(items):
+            keys = [_make_key(namespace, item) for item in items]
+            results = [_cache.get(key) for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                computed = func([items[i] for i in missing])
+                for i, result in zip(missing, computed):
+                    results[i] = result
+                    if result:
+                        _cache.set(keys[i], result, expire=expire)
+            return results
+        return wrapper
+
+    return decorator
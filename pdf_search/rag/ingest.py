@@ -1,16 +1,30 @@
 import logging
-import time
 
 from langchain_community.document_loaders import PyMuPDFLoader
 
-from elastic_search import ESClient
+from elastic_search import bulk_index
 from utils import split_documents_into_chunks, chunk_audio_segments
 from embedding import embedding
 from extract import extract_images_from_pdf, extract_tables_from_pdf, transcribe_audio
 
 
+def _write_documents(es, es_index, docs):
+    """Bulk index documents and report failed writes."""
+    success, errors = bulk_index(es, es_index, docs)
+    for error in errors:
+        print(f"[Elastic Error] {error}")
+    return success
+
+
 def ingest_pdf(es, es_index, file_path, include_image=False, include_table=False):
     """Ingest PDF file and index documents to Elasticsearch."""
+    docs = build_pdf_documents(file_path, include_image, include_table)
+    success = _write_documents(es, es_index, docs)  # 批量写入elastic
+    print(f"PDF ingestion completed: {success}/{len(docs)} documents indexed")
+
+
+def build_pdf_documents(file_path, include_image=False, include_table=False):
+    """Extract and embed a PDF file into Elasticsearch documents without indexing them."""
     print(f"Ingesting file: {file_path}")
     loader = PyMuPDFLoader(file_path)  # 如果报错则使用PyMuPDFLoader处理pdf文件
     pages = loader.load()
@@ -26,6 +40,7 @@ def ingest_pdf(es, es_index, file_path, include_image=False, include_table=False
     tables = extract_tables_from_pdf(file_path) if include_table else []
     
     chunks = split_documents_into_chunks(pages, chunk_size=1024, chunk_overlap=100)
+    docs = []
     batch = []
     for i, chunk in enumerate(chunks):  # 收集25个chunks为一批送到嵌入模型，增加速度
         batch.append(chunk)
@@ -38,24 +53,14 @@ def ingest_pdf(es, es_index, file_path, include_image=False, include_table=False
                 metadata["type"] = "text"
                 metadata["file_path"] = file_path
                 
-                body = {
+                docs.append({
                     "text": pc.page_content,
                     "vector": embeddings[j],
                     "metadata": metadata,
-                }
-                retry = 0
-                while retry <= 5:
-                    try:
-                        # print(body)
-                        es.index(index=es_index, body=body)  # 写入elastic
-                        break
-                    except Exception as e:
-                        print(f"[Elastic Error] {str(e)} retry")
-                    retry += 1
-                    time.sleep(1)
+                })
             batch = []
     
-    print("Text ingestion completed")
+    print("Text embedding completed")
 
     # Process images
     if images:
@@ -67,22 +72,13 @@ def ingest_pdf(es, es_index, file_path, include_image=False, include_table=False
             metadata["type"] = "image"
             metadata["file_path"] = file_path
             
-            body = {
+            docs.append({
                 "text": img["context_augmented_summary"],
                 "vector": image_embeddings[i],
                 "metadata": metadata,
-            }
-            retry = 0
-            while retry <= 5:
-                try:
-                    es.index(index=es_index, body=body)
-                    break
-                except Exception as e:
-                    print(f"[Elastic Error] {str(e)} retry")
-                    retry += 1
-                    time.sleep(1)
+            })
         
-        print("Image ingestion completed")
+        print("Image embedding completed")
 
     # Process tables
     if tables:
@@ -94,26 +90,26 @@ def ingest_pdf(es, es_index, file_path, include_image=False, include_table=False
             metadata["type"] = "table"
             metadata["file_path"] = file_path
             
-            body = {
+            docs.append({
                 "text": table["context_augmented_table"],
                 "vector": table_embeddings[i],
                 "metadata": metadata,
-            }
-            retry = 0
-            while retry <= 5:
-                try:
-                    es.index(index=es_index, body=body)
-                    break
-                except Exception as e:
-                    print(f"[Elastic Error] {str(e)} retry")
-                    retry += 1
-                    time.sleep(1)
+            })
         
-        print("Table ingestion completed")
+        print("Table embedding completed")
+
+    return docs
 
 
 def ingest_audio(es, es_index, file_path, json_path=None, chunk_size=256, chunk_overlap=128):
     """Ingest audio file and index transcribed chunks to Elasticsearch."""
+    docs = build_audio_documents(file_path, json_path, chunk_size, chunk_overlap)
+    success = _write_documents(es, es_index, docs)
+    print(f"Audio ingestion completed: {success}/{len(docs)} documents indexed")
+
+
+def build_audio_documents(file_path, json_path=None, chunk_size=256, chunk_overlap=128):
+    """Transcribe and embed an audio file into Elasticsearch documents without indexing them."""
     print(f"Ingesting audio file: {file_path}")
     
     # Transcribe audio file
@@ -122,13 +118,14 @@ def ingest_audio(es, es_index, file_path, json_path=None, chunk_size=256, chunk_
     
     if not segments:
         print("No audio segments found")
-        return
+        return []
     
     # Chunk audio segments
     chunks = chunk_audio_segments(segments, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     print(f"Created {len(chunks)} audio chunks")
     
     # Process chunks in batches
+    docs = []
     batch = []
     for i, chunk in enumerate(chunks):
         batch.append(chunk)
@@ -143,22 +140,14 @@ def ingest_audio(es, es_index, file_path, json_path=None, chunk_size=256, chunk_
                 metadata_dict["language"] = metadata.get("language", "unknown")
                 metadata_dict["duration"] = str(metadata.get("duration", 0))
                 
-                body = {
+                docs.append({
                     "text": pc.page_content,
                     "vector": embeddings[j],
                     "metadata": metadata_dict,
-                }
-                retry = 0
-                while retry <= 5:
-                    try:
-                        es.index(index=es_index, body=body)
-                        break
-                    except Exception as e:
-                        print(f"[Elastic Error] {str(e)} retry")
-                        retry += 1
-                        time.sleep(1)
+                })
             batch = []
     
-    print("Audio ingestion completed")
+    print("Audio embedding completed")
+    return docs
 
 
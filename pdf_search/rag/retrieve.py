@@ -1,12 +1,57 @@
+import functools
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
 import jieba
 import requests
+from elasticsearch import ApiError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from config import RERANK_URL
+from config import EMBEDDING_URL, RERANK_URL
 from constants import STOP_WORDS
 from elastic_search import ESClient
 from embedding import embedding
+from ._cache import cached_batch
+
+
+# Shared executor for overlapping query embedding with keyword extraction
+_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# Shared HTTP session so rerank calls reuse keep-alive connections
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(connect=3, backoff_factor=0.3))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Vector search parameters
+KNN_K = 10
+KNN_NUM_CANDIDATES = 100
+
+# Server-side RRF settings (ES 8.8 - 8.x), disabled once the server rejects the
+# rank section (ES < 8.8) or the license does not cover it
+RRF_WINDOW_SIZE = 100
+_native_rrf_supported = True
+# rank.rrf.window_size was renamed to rank_window_size in ES 8.14
+RRF_RANK_WINDOW_SIZE_VERSION = (8, 14)
+
+# Rerank scores keyed by (query, document text)
+RERANK_CACHE_TTL = 3600
+RERANK_CACHE_SIZE = 100000
+_RERANK_CACHE = {}
+
+# Load the jieba dictionary once at import instead of on the first query
+_TOKENIZER = jieba.Tokenizer()
+_TOKENIZER.initialize()
+
+_ASCII_WORD_RE = re.compile(r"\w+")
+_TIMESTAMP_RE = re.compile(r"\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}\.\d{3}")
+
+# Precomputed reciprocal rank scores for the default RRF constant
+_RRF_K = 60
+_RRF_INV = [1.0 / (_RRF_K + rank) for rank in range(1, 1001)]
 
 
 # =============================================================================
@@ -26,9 +71,13 @@ def get_keyword(query):
         print("[Get Keyword] Empty query string, returning empty list")
         return []
     
+    # 纯英文查询无需 jieba 分词
+    if query.isascii():
+        return [word for word in _ASCII_WORD_RE.findall(query.lower()) if word not in STOP_WORDS]
+    
     try:
         # 使用搜索引擎模式进行分词
-        seg_list = jieba.cut_for_search(query)
+        seg_list = _TOKENIZER.cut_for_search(query)
         # Filter out stop words
         filtered_keywords = [word for word in seg_list if word not in STOP_WORDS]
         return filtered_keywords
@@ -37,37 +86,35 @@ def get_keyword(query):
         return []
 
 
-def hybrid_search_rrf(keyword_hits, vector_hits, k=60):
+def hybrid_search_rrf(keyword_hits, vector_hits, k=_RRF_K):
     """Combine keyword and vector search results using Reciprocal Rank Fusion."""
     
-    # Initialize score dictionary
+    # Build the score dictionary in a single pass over both hit lists
     scores = {}
-    
-    # Process keyword hits
-    for hit in keyword_hits:
+    for hit in chain(keyword_hits, vector_hits):
         doc_id = hit["id"]
-        if doc_id not in scores:
-            scores[doc_id] = {"score": 0, "text": hit["text"], "id": doc_id, 
-                             "file_id": hit["file_id"], "image_id": hit["image_id"], 
-                             "metadata": hit["metadata"]}
-        scores[doc_id]["score"] += 1 / (k + hit["rank"])
-    
-    # Process vector hits
-    for hit in vector_hits:
-        doc_id = hit["id"]
-        if doc_id not in scores:
-            scores[doc_id] = {"score": 0, "text": hit["text"], "id": doc_id, 
-                             "file_id": hit["file_id"], "image_id": hit["image_id"], 
-                             "metadata": hit["metadata"]}
-        scores[doc_id]["score"] += 1 / (k + hit["rank"])
+        doc = scores.get(doc_id)
+        if doc is None:
+            doc = scores[doc_id] = {"score": 0, "text": hit["text"], "id": doc_id, 
+                                    "file_id": hit["file_id"], "image_id": hit["image_id"], 
+                                    "metadata": hit["metadata"]}
+        rank = hit["rank"]
+        if k == _RRF_K and rank <= len(_RRF_INV):
+            doc["score"] += _RRF_INV[rank - 1]
+        else:
+            doc["score"] += 1 / (k + rank)
     
     # Sort documents by their RRF score and assign ranks
     ranked_docs = sorted(scores.values(), key=lambda x: x["score"], reverse=True)
+    return _format_ranked_docs(ranked_docs)
+
 
+def _format_ranked_docs(ranked_docs):
+    """Strip transcript timestamps and assign final ranks to fused results."""
+    
     # Removing the timestamps
-    for _, doc in enumerate(ranked_docs):
-        timestamp_pattern = re.compile(r"\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}\.\d{3}")
-        doc["text"] = re.sub(timestamp_pattern, "", doc["text"])    
+    for doc in ranked_docs:
+        doc["text"] = _TIMESTAMP_RE.sub("", doc["text"])
         
     # Format the final list of results
     final_results = [{"id": doc["id"], "text": doc["text"], "file_id": doc["file_id"], 
@@ -76,12 +123,25 @@ def hybrid_search_rrf(keyword_hits, vector_hits, k=60):
     return final_results
 
 
-def elastic_search(es, text, es_index):
-    """Perform hybrid search (keyword + vector) on Elasticsearch."""
-    
-    key_words = get_keyword(text)
+# Namespaced by endpoint so switching the embedding model does not return stale vectors
+@cached_batch(f"query_embedding:{EMBEDDING_URL}")
+def embed_queries(texts):
+    """Embed search queries in a single request, cached per query across sessions."""
+    return embedding(texts)
+
+
+def _parse_hits(res):
+    """Convert an Elasticsearch search response into ranked hit dicts."""
+    return [{"id": hit["_id"], "text": hit["_source"].get("text"), 
+             "file_id": hit["_source"].get("file_id"), "image_id": hit["_source"].get("image_id"), 
+             "metadata": hit["_source"].get("metadata"), "rank": idx + 1} 
+            for idx, hit in enumerate(res["hits"]["hits"])]
 
-    keyword_query = {
+
+def _keyword_query(text):
+    """Build the keyword half of the hybrid search."""
+    key_words = get_keyword(text)
+    return {
         "bool": {
             "should": [
                 {"match": {"text": {"query": keyword, "fuzziness": "AUTO"}}} for keyword in key_words
@@ -89,49 +149,148 @@ def elastic_search(es, text, es_index):
             "minimum_should_match": 1
         }
     }
-    res_keyword = es.search(index=es_index, query=keyword_query)
-    keyword_hits = [{"id": hit["_id"], "text": hit["_source"].get("text"), 
-                     "file_id": hit["_source"].get("file_id"), "image_id": hit["_source"].get("image_id"), 
-                     "metadata": hit["_source"].get("metadata"), "rank": idx + 1} 
-                    for idx, hit in enumerate(res_keyword["hits"]["hits"])]
-
-    embedding_vector = embedding([text])
-    vector_query = {
-        "bool": {
-            "must": [{"match_all": {}}],
-            "should": [
-                {"script_score": {
-                    "query": {"match_all": {}},
-                    "script": {
-                        "source": "cosineSimilarity(params.queryVector, \"vector\") + 1.0",
-                        "params": {"queryVector": embedding_vector[0]}
-                    }
-                }}
-            ]
-        }
+
+
+def _knn_query(query_vector):
+    """Approximate kNN over the HNSW index instead of a brute-force script_score scan."""
+    return {
+        "field": "vector",
+        "query_vector": query_vector,
+        "k": KNN_K,
+        "num_candidates": KNN_NUM_CANDIDATES
     }
-    res_vector = es.search(index=es_index, query=vector_query)
+
+
+@functools.lru_cache(maxsize=8)
+def _rrf_window_key(es):
+    """Pick the RRF window parameter name for the server version."""
+    version = tuple(int(part) for part in es.info()["version"]["number"].split(".")[:2])
+    return "rank_window_size" if version >= RRF_RANK_WINDOW_SIZE_VERSION else "window_size"
+
+
+def _rrf_unsupported(status, error):
+    """Whether a search error means server-side RRF is unavailable rather than a transient failure."""
+    message = str(error).lower()
+    if status == 403:
+        return "license" in message
+    return status == 400 and ("rrf" in message or "rank" in message)
+
+
+def _failed_search(res, query):
+    """Log a failed multi-search sub-response; returns True if the search failed."""
+    if "error" not in res:
+        return False
+    print(f"[Elastic Search] Search failed for \"{query}\": {res['error']}")
+    return True
+
+
+def elastic_search(es, text, es_index):
+    """Perform hybrid search (keyword + vector) on Elasticsearch."""
+    return elastic_search_many(es, [text], es_index)[0]
+
+
+def elastic_search_many(es, texts, es_index):
+    """
+    Perform hybrid search for several queries with one embedding call and one msearch.
     
-    vector_hits = [{"id": hit["_id"], "text": hit["_source"].get("text"), 
-                    "file_id": hit["_source"].get("file_id"), "image_id": hit["_source"].get("image_id"), 
-                    "metadata": hit["_source"].get("metadata"), "rank": idx + 1} 
-                   for idx, hit in enumerate(res_vector["hits"]["hits"])]
+    Returns:
+        list: Fused search results for each query, in input order
+              (empty for a query whose search failed)
+    """
     
-    combined_results = hybrid_search_rrf(keyword_hits, vector_hits)
-    return combined_results
+    # Embed all queries while keywords are extracted
+    embedding_future = _EXECUTOR.submit(embed_queries, list(texts))
+    keyword_queries = [_keyword_query(text) for text in texts]
+    knn_queries = [_knn_query(vector) for vector in embedding_future.result()]
+
+    # Let Elasticsearch fuse both searches server-side (ES >= 8.8)
+    global _native_rrf_supported
+    if _native_rrf_supported:
+        rrf = {_rrf_window_key(es): RRF_WINDOW_SIZE, "rank_constant": _RRF_K}
+        searches = []
+        for keyword_query, knn_query in zip(keyword_queries, knn_queries):
+            searches.append({"index": es_index})
+            searches.append({
+                "query": keyword_query,
+                "knn": knn_query,
+                "rank": {"rrf": rrf},
+                "size": 2 * KNN_K
+            })
+        # Only an unsupported-feature or license response disables native RRF;
+        # other failed searches only empty the results of their own query
+        try:
+            responses = es.msearch(searches=searches)["responses"]
+        except ApiError as e:
+            if not _rrf_unsupported(e.meta.status, e):
+                raise
+            responses, error = None, e
+        if responses is not None:
+            unsupported = next((res for res in responses
+                                if "error" in res and _rrf_unsupported(res.get("status"), res["error"])), None)
+            if unsupported is None:
+                return [[] if _failed_search(res, text) else _format_ranked_docs(_parse_hits(res))
+                        for text, res in zip(texts, responses)]
+            error = unsupported["error"]
+        print(f"[Elastic Search] Native RRF unavailable, falling back to client-side RRF: {error}")
+        _native_rrf_supported = False
+
+    # Fallback: send every keyword and vector search in a single round-trip and fuse them here
+    searches = []
+    for keyword_query, knn_query in zip(keyword_queries, knn_queries):
+        searches.append({"index": es_index})
+        searches.append({"query": keyword_query})
+        searches.append({"index": es_index})
+        searches.append({"knn": knn_query, "size": KNN_K})
+    responses = es.msearch(searches=searches)["responses"]
+
+    return [
+        [] if _failed_search(res_keyword, text) or _failed_search(res_vector, text)
+        else hybrid_search_rrf(_parse_hits(res_keyword), _parse_hits(res_vector))
+        for text, res_keyword, res_vector in zip(texts, responses[0::2], responses[1::2])
+    ]
 
 
 # =============================================================================
 # Post-Processing Functions
 # =============================================================================
 
+def _cached_rerank_score(query, text, now):
+    """Look up a cached rerank score, dropping it if expired."""
+    entry = _RERANK_CACHE.get((query, text))
+    if entry is None:
+        return None
+    score, expires_at = entry
+    if expires_at < now:
+        _RERANK_CACHE.pop((query, text), None)
+        return None
+    return score
+
+
 def rerank(query, result_doc):
     """Rerank documents using external reranking service."""
     
-    res = requests.post(RERANK_URL, json={"query": query, "documents": [doc["text"] for doc in result_doc]}).json()
-    if res and "scores" in res and len(res["scores"]) == len(result_doc):
-        for idx, doc in enumerate(result_doc):
-            result_doc[idx]["score"] = res["scores"][idx]
+    now = time.monotonic()
+    scores = {}
+    for doc in result_doc:
+        score = _cached_rerank_score(query, doc["text"], now)
+        if score is not None:
+            scores[doc["text"]] = score
+    
+    # Only send texts that are neither cached nor duplicated
+    pending = list(dict.fromkeys(doc["text"] for doc in result_doc if doc["text"] not in scores))
+    if pending:
+        res = _SESSION.post(RERANK_URL, json={"query": query, "documents": pending}, timeout=(3, 30)).json()
+        if res and "scores" in res and len(res["scores"]) == len(pending):
+            expires_at = now + RERANK_CACHE_TTL
+            if len(_RERANK_CACHE) >= RERANK_CACHE_SIZE:
+                _RERANK_CACHE.clear()
+            for text, score in zip(pending, res["scores"]):
+                scores[text] = score
+                _RERANK_CACHE[(query, text)] = (score, expires_at)
+    
+    if len(scores) == len(set(doc["text"] for doc in result_doc)):
+        for doc in result_doc:
+            doc["score"] = scores[doc["text"]]
         
         # Sort documents by rerank score in descending order (highest scores first)
         result_doc.sort(key=lambda x: x["score"], reverse=True)
@@ -139,6 +298,27 @@ def rerank(query, result_doc):
     return result_doc
 
 
+def rerank_many(query_docs):
+    """
+    Rerank the documents of several queries concurrently.
+    
+    Args:
+        query_docs (dict): Mapping of query to its list of documents
+    
+    Returns:
+        dict: Mapping of query to its reranked documents (empty if its rerank failed)
+    """
+    futures = {query: _EXECUTOR.submit(rerank, query, docs) for query, docs in query_docs.items()}
+    results = {}
+    for query, future in futures.items():
+        try:
+            results[query] = future.result()
+        except Exception as e:
+            print(f"[Rerank] Failed to rerank \"{query}\": {e}")
+            results[query] = []
+    return results
+
+
 def enhance_retrieve(es, query, es_index, top_k=10):
     """
     Combine elastic search and reranking to return top-k results.
@@ -162,3 +342,26 @@ def enhance_retrieve(es, query, es_index, top_k=10):
     return reranked_results[:top_k]
 
 
+def enhance_retrieve_many(es, queries, es_index, top_k=10):
+    """
+    Retrieve and rerank results for several queries at once.
+    
+    Queries are embedded in one request, searched with one msearch and
+    reranked concurrently.
+    
+    Args:
+        es: Elasticsearch client
+        queries (list): Search queries
+        es_index (str): Elasticsearch index name
+        top_k (int): Number of top results to return per query (default: 10)
+    
+    Returns:
+        dict: Mapping of query to its top-k reranked search results
+    """
+    queries = list(dict.fromkeys(queries))
+    if not queries:
+        return {}
+    
+    search_results = elastic_search_many(es, queries, es_index)
+    reranked_results = rerank_many(dict(zip(queries, search_results)))
+    return {query: docs[:top_k] for query, docs in reranked_results.items()}
@@ -1,15 +1,38 @@
-import json
+import functools
+
+import orjson
 import requests
 from openai import OpenAI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from config import BOCHAAI_URL, BOCHAAI_API_KEY, ARK_URL, ARK_API_KEY
 
 
+# Shared HTTP session so web searches reuse keep-alive connections
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(connect=3, backoff_factor=0.3))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_ark_client():
+    """Shared Ark client, created on first use so .env can be loaded first."""
+    return OpenAI(base_url=ARK_URL, api_key=ARK_API_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_openai_client():
+    """Shared OpenAI client, created on first use so .env can be loaded first."""
+    return OpenAI()
+
+
 def bocha_web_search(web_query):
     key = BOCHAAI_API_KEY
     url = BOCHAAI_URL
 
-    payload = json.dumps({
+    payload = orjson.dumps({
         "query": web_query,
         "count": 10,
         "summary": True,
@@ -20,39 +43,21 @@ def bocha_web_search(web_query):
         "Content-Type": "application/json"
     }
 
-    response = requests.request("POST", url, headers=headers, data=payload)
-    # print(response.json())
-    web_pages = response.json().get("data", {}).get("webPages", {}).get("value", [])
-
-    top_results = []
-    for page in web_pages:
-        result = {
-            "title": page.get("name"),
-            "url": page.get("url"),
-            "date": page.get("dateLastCrawled"),
-            "source": page.get("siteName"),
-            "logo": page.get("siteIcon"),
-            "summary": page.get("summary"),
-            "snippet": page.get("snippet")
-        }
-        top_results.append(result)
-        
+    response = _SESSION.post(url, headers=headers, data=payload, timeout=(3, 30))
+    web_pages = orjson.loads(response.content).get("data", {}).get("webPages", {}).get("value", [])
+
     web_articles_text = "\n\n```\n".join(
-        f"标题：{web.get('title', '无标题')}\n"
-        f"日期：{web.get('date', '未知日期')}\n"
-        f"内容：{web.get('summary', '')}"
-        for web in top_results
+        f"标题：{page.get('name', '无标题')}\n"
+        f"日期：{page.get('dateLastCrawled', '未知日期')}\n"
+        f"内容：{page.get('summary', '')}"
+        for page in web_pages
     )
     return web_articles_text
 
 
 def ask_llm(query, websearch=None):
     if ARK_API_KEY:
-        client = OpenAI(
-            base_url=ARK_URL,
-            api_key=ARK_API_KEY,
-        )
-        response = client.chat.completions.create(
+        response = _get_ark_client().chat.completions.create(
             model="deepseek-v3-250324",
             messages=[
                 {"role": "user", "content": f"{query}\n\n参考资料：\n{websearch}" if websearch is not None else query}
@@ -61,8 +66,7 @@ def ask_llm(query, websearch=None):
             timeout=60
         )
     else:
-        client = OpenAI()
-        response = client.chat.completions.create(
+        response = _get_openai_client().chat.completions.create(
             model="gpt-5-nano",
             messages=[
                 {"role": "user", "content": f"{query}\n\n参考资料：\n{websearch}" if websearch is not None else query}
@@ -6,24 +6,43 @@ Interactive PDF Ingestion Script for Elasticsearch
 This script provides an interactive interface for ingesting PDF files into Elasticsearch.
 """
 
+import contextlib
+import functools
+import itertools
+import multiprocessing
 import os
+import stat
 import sys
 import subprocess
-import glob
 from pathlib import Path
 
+from dotenv import load_dotenv
+from tqdm import tqdm
+
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from elastic_search import ESClient
-from rag.ingest import ingest_pdf, ingest_audio
+from rag.ingest import build_pdf_documents, build_audio_documents
 from constants import PDF_FILE_EXTENSIONS, AUDIO_FILE_EXTENSIONS
 
 
+# Store vectors as int8 in the HNSW graph (ES >= 8.11); query vectors stay float32
+VECTOR_INDEX_OPTIONS = {"type": "int8_hnsw", "m": 16, "ef_construction": 100}
+
+# Lowercase file suffixes accepted for ingestion
+PDF_SUFFIXES = frozenset(f'.{ext.lower()}' for ext in PDF_FILE_EXTENSIONS)
+AUDIO_SUFFIXES = frozenset(f'.{ext.lower()}' for ext in AUDIO_FILE_EXTENSIONS)
+SUPPORTED_SUFFIXES = PDF_SUFFIXES | AUDIO_SUFFIXES
+
+# Interpreter and working-directory checks, resolved once at import
+IN_VENV = hasattr(sys, 'real_prefix') or sys.prefix != getattr(sys, 'base_prefix', sys.prefix)
+HAS_VENV_DIR = Path("venv").is_dir()
+
+
 def check_virtual_environment():
     """Check if virtual environment exists and is activated."""
-    venv_path = Path("venv")
-    if not venv_path.exists():
+    if not HAS_VENV_DIR:
         print("❌ Virtual environment not found!")
         print("Please create a virtual environment first:")
         print("  python -m venv venv")
@@ -31,7 +50,7 @@ def check_virtual_environment():
         print("  pip install -r requirements.txt")
         return False
     
-    if not hasattr(sys, 'real_prefix') and not (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix):
+    if not IN_VENV:
         print("⚠️  Warning: Virtual environment may not be activated")
         print("Please run: source venv/bin/activate")
     
@@ -44,12 +63,7 @@ def load_environment():
     if env_file.exists():
         print("Loading environment variables from .env...")
         try:
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        os.environ[key.strip()] = value.strip()
+            load_dotenv(env_file, override=True)
             print("✓ Environment variables loaded")
         except Exception as e:
             print(f"⚠️  Warning: Failed to load .env file: {e}")
@@ -58,6 +72,23 @@ def load_environment():
     print()
 
 
+def get_ingest_workers():
+    """Number of ingestion worker processes from INGEST_WORKERS (defaults to the CPU count).
+
+    Read after load_environment() so a value set in .env is honoured.
+    """
+    return int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def get_audio_ingest_workers():
+    """Number of audio transcription worker processes from AUDIO_INGEST_WORKERS (defaults to 1).
+
+    Every audio worker loads its own faster-whisper large-v3 model (~3 GB, plus a
+    CUDA context on GPU), so audio files get a separate, much smaller pool.
+    """
+    return int(os.getenv("AUDIO_INGEST_WORKERS", "0")) or 1
+
+
 def get_user_input(prompt, validation_func=None, error_msg="Invalid input. Please try again."):
     """Get user input with optional validation."""
     while True:
@@ -98,11 +129,13 @@ def get_file_directory():
     def validate_directory(path):
         if not path:
             return False
-        path_obj = Path(path)
-        if not path_obj.exists():
+        # One stat call covers both the existence and the directory check
+        try:
+            mode = os.stat(path).st_mode
+        except OSError:
             print(f"Directory '{path}' does not exist.")
             return False
-        if not path_obj.is_dir():
+        if not stat.S_ISDIR(mode):
             print(f"'{path}' is not a directory.")
             return False
         return True
@@ -128,19 +161,10 @@ def get_boolean_input(prompt):
 
 def find_supported_files(directory):
     """Find all supported files (PDF and audio) in the given directory."""
-    all_patterns = []
-    
-    # Add PDF patterns
-    for ext in PDF_FILE_EXTENSIONS:
-        all_patterns.extend([f'*.{ext}', f'*.{ext.upper()}'])
-    
-    # Add audio patterns
-    for ext in AUDIO_FILE_EXTENSIONS:
-        all_patterns.extend([f'*.{ext}', f'*.{ext.upper()}'])
-    
-    supported_files = []
-    for pattern in all_patterns:
-        supported_files.extend(glob.glob(os.path.join(directory, pattern)))
+    # Single directory scan with a case-insensitive suffix lookup
+    with os.scandir(directory) as entries:
+        supported_files = [entry.path for entry in entries
+                           if entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_SUFFIXES]
     
     return sorted(supported_files)
 
@@ -168,6 +192,37 @@ def confirm_settings(index_name, file_directory, supported_files, include_image,
     return get_boolean_input("\nProceed with ingestion?")
 
 
+def _build_pdf(file_path, include_image, include_table):
+    return build_pdf_documents(
+        file_path=file_path,
+        include_image=include_image,
+        include_table=include_table
+    )
+
+
+def _build_audio(file_path, include_image, include_table):
+    return build_audio_documents(file_path=file_path)
+
+
+# File suffix -> (kind, document builder)
+SUFFIX_HANDLERS = {suffix: ("PDF", _build_pdf) for suffix in PDF_SUFFIXES}
+SUFFIX_HANDLERS.update({suffix: ("audio", _build_audio) for suffix in AUDIO_SUFFIXES})
+
+
+def _build_one(file_path, include_image, include_table):
+    """Extract and embed a single file in a worker process.
+
+    Returns (file_path, kind, docs, error); documents are indexed by the parent process.
+    """
+    kind, build = SUFFIX_HANDLERS.get(os.path.splitext(file_path)[1].lower(), (None, None))
+    if build is None:
+        return file_path, None, [], None
+    try:
+        return file_path, kind, build(file_path, include_image, include_table), None
+    except Exception as e:
+        return file_path, None, [], str(e)
+
+
 def main():
     """Main interactive function."""
     print("🚀 PDF Ingestion Script for Elasticsearch")
@@ -221,7 +276,8 @@ def main():
         es_client.create_index(
             index_name, 
             vector_dims=1024, 
-            metadata_fields={"metadata": "object"}
+            metadata_fields={"metadata": "object"},
+            vector_index_options=VECTOR_INDEX_OPTIONS
         )
         print("✓ Index created successfully")
     except Exception as e:
@@ -229,46 +285,48 @@ def main():
         return
     
     # Process files based on extension
-    print(f"\n📄 Processing {len(supported_files)} files...")
+    total = len(supported_files)
+    print(f"\n📄 Processing {total} files...")
     print("="*60)
     
     successful_files = 0
     failed_files = []
     
-    for i, file_path in enumerate(supported_files, 1):
-        print(f"\n[{i}/{len(supported_files)}] Processing: {os.path.basename(file_path)}")
-        
-        # Get file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        try:
-            if file_ext in [f'.{ext}' for ext in PDF_FILE_EXTENSIONS]:
-                # Process PDF file
-                ingest_pdf(
-                    es=es_client.es,
-                    es_index=index_name,
-                    file_path=file_path,
-                    include_image=include_image,
-                    include_table=include_table
-                )
-                print(f"✓ Successfully processed PDF: {os.path.basename(file_path)}")
-                successful_files += 1
-            elif file_ext in [f'.{ext}' for ext in AUDIO_FILE_EXTENSIONS]:
-                # Process audio file
-                ingest_audio(
-                    es=es_client.es,
-                    es_index=index_name,
-                    file_path=file_path
-                )
-                print(f"✓ Successfully processed audio: {os.path.basename(file_path)}")
-                successful_files += 1
+    # Workers extract and embed files; this process is the single bulk indexer
+    build_one = functools.partial(
+        _build_one,
+        include_image=include_image,
+        include_table=include_table
+    )
+    # Audio goes to its own small pool: each worker holds a full Whisper model in memory
+    audio_files = [f for f in supported_files if os.path.splitext(f)[1].lower() in AUDIO_SUFFIXES]
+    other_files = [f for f in supported_files if os.path.splitext(f)[1].lower() not in AUDIO_SUFFIXES]
+    with contextlib.ExitStack() as stack:
+        result_iters = []
+        for files, workers in ((other_files, get_ingest_workers()),
+                               (audio_files, get_audio_ingest_workers())):
+            if files:
+                pool = stack.enter_context(multiprocessing.Pool(processes=min(workers, len(files))))
+                result_iters.append(pool.imap_unordered(build_one, files))
+        results = itertools.chain.from_iterable(result_iters)
+        for file_path, kind, docs, error in tqdm(results, total=total, desc="Ingesting", unit="file"):
+            name = os.path.basename(file_path)
+            if error is None and kind is not None:
+                try:
+                    indexed, errors = es_client.bulk_index(index_name, docs)
+                    if errors:
+                        error = f"{len(errors)} of {len(docs)} documents failed to index"
+                except Exception as e:
+                    # A transport error fails this file only; keep consuming worker results
+                    error = str(e)
+            if error is not None:
+                tqdm.write(f"❌ Failed to process {name}: {error}")
+                failed_files.append((file_path, error))
+            elif kind is None:
+                tqdm.write(f"⚠️  Skipping unsupported file type: {os.path.splitext(file_path)[1].lower()}")
             else:
-                print(f"⚠️  Skipping unsupported file type: {file_ext}")
-                continue
-                
-        except Exception as e:
-            print(f"❌ Failed to process {os.path.basename(file_path)}: {e}")
-            failed_files.append((file_path, str(e)))
+                tqdm.write(f"✓ Successfully processed {kind}: {name} ({indexed} documents)")
+                successful_files += 1
     
     # Final summary
     print("\n" + "="*60)
@@ -1,17 +1,26 @@
+import functools
+import os
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+
 import tiktoken
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 
+# Loaded once; count_tokens_in_text is the splitter's length function and runs per chunk
+_ENCODING = tiktoken.get_encoding("cl100k_base")
+
+
 def count_tokens_in_text(text: str) -> int:
     """Calculate number of tokens in a text string using tiktoken."""
-    encoding = tiktoken.get_encoding("cl100k_base")
-    num_tokens = len(encoding.encode(text))
-    return num_tokens
+    return len(_ENCODING.encode(text))
 
 
+@functools.lru_cache(maxsize=8)
 def create_document_splitter(chunk_size: int = 1024, chunk_overlap: int = 100):
-    """Create a text splitter with specified parameters for document chunking."""
+    """Create a text splitter with specified parameters for document chunking (cached per settings)."""
     return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size, 
         chunk_overlap=chunk_overlap, 
@@ -22,14 +31,22 @@ def create_document_splitter(chunk_size: int = 1024, chunk_overlap: int = 100):
 def split_documents_into_chunks(documents, chunk_size: int = 1024, chunk_overlap: int = 100):
     """Split documents into chunks using the text splitter."""
     splitter = create_document_splitter(chunk_size, chunk_overlap)
-    chunks = splitter.split_documents(documents)
-    return chunks
+    if len(documents) <= 1:
+        return splitter.split_documents(documents)
+
+    # Split documents concurrently; tiktoken releases the GIL while encoding
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(documents))) as executor:
+        results = executor.map(lambda doc: splitter.split_documents([doc]), documents)
+        return [chunk for chunks in results for chunk in chunks]
 
 
 def truncate_text(text: str, max_length: int = 1500) -> str:
     """Truncate text to specified length with ellipsis indicator."""
     if text is None:
         return ""
+    # Fast path: already short with no surrounding whitespace, no copy needed
+    if len(text) <= max_length and not (text[:1].isspace() or text[-1:].isspace()):
+        return text
     text = text.strip()
     if len(text) <= max_length:
         return text
@@ -38,25 +55,25 @@ def truncate_text(text: str, max_length: int = 1500) -> str:
 
 def chunk_audio_segments(segments, chunk_size: int = 256, chunk_overlap: int = 128):
     """Group short transcript lines into larger chunks."""    
-    seg_texts = [seg["text"].strip() + " " for seg in segments]
-    seg_sizes = [count_tokens_in_text(text) for text in seg_texts]
+    seg_texts = [f'{seg["text"].strip()} ' for seg in segments]
+    seg_sizes = [len(tokens) for tokens in _ENCODING.encode_ordinary_batch(seg_texts)]
+
+    # Prefix sums: the token count of segments [i, j) is prefix[j] - prefix[i]
+    prefix = [0, *accumulate(seg_sizes)]
 
     n = len(segments)
     start_idx = 0
     end_idx = 0
-    curr_size = 0
     chunks = []
 
     while end_idx < n:
-        while end_idx < n and curr_size < chunk_size:
-            curr_size += seg_sizes[end_idx]
-            end_idx += 1
+        # Smallest end reaching chunk_size tokens, advancing by at least one segment
+        end_idx = min(n, bisect_left(prefix, prefix[start_idx] + chunk_size, lo=end_idx + 1))
         if end_idx == n:
-            while start_idx > 0 and curr_size < chunk_size:
-                start_idx -= 1
-                curr_size += seg_sizes[start_idx]
-        
-        text = "".join(seg_texts[i] for i in range(start_idx, end_idx))
+            # Extend the last chunk backwards to a full chunk_size
+            start_idx = min(start_idx, max(0, bisect_right(prefix, prefix[n] - chunk_size) - 1))
+
+        text = "".join(seg_texts[start_idx:end_idx])
         chunks.append(
             Document(
                 page_content=text,
@@ -67,15 +84,12 @@ def chunk_audio_segments(segments, chunk_size: int = 256, chunk_overlap: int = 1
                     "start_segment": start_idx,
                     "end_segment": end_idx - 1,
                     "segments": end_idx - start_idx,
-                    "tokens": count_tokens_in_text(text),
+                    "tokens": prefix[end_idx] - prefix[start_idx],
                 },
             )
         )
 
-        start_idx = end_idx
-        curr_size = 0
-        while start_idx > 0 and curr_size < chunk_overlap:
-            start_idx -= 1
-            curr_size += seg_sizes[start_idx]
+        # Step back over at least chunk_overlap tokens for the next chunk
+        start_idx = max(0, bisect_right(prefix, prefix[end_idx] - chunk_overlap, hi=end_idx + 1) - 1)
 
     return chunks
@@ -1,11 +1,17 @@
+import logging
 import os
+import queue
+import sqlite3
+import threading
+import time
 import uuid
-from flask import Flask, request, jsonify, abort, redirect, render_template
+from flask import Flask, request, jsonify, abort, redirect, render_template, g
 from dotenv import load_dotenv
 import stripe
 
 load_dotenv()
 app = Flask(__name__)
+app.logger.setLevel(logging.INFO)
 
 # 加载环境变量
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
@@ -23,8 +29,12 @@ if not PRICE_ONE_TIME:
 if not PRICE_SUB_MONTHLY:
     raise ValueError("PRICE_SUB_MONTHLY 未设置")
 
+# 价格信息缓存：price_id -> (价格信息, 获取时间)
+PRICE_CACHE_TTL = 300
+_price_cache = {}
+
 # 从Stripe API获取真实价格信息
-def get_price_info(price_id):
+def fetch_price_info(price_id):
     """从Stripe API获取价格信息"""
     try:
         price = stripe.Price.retrieve(price_id)
@@ -39,12 +49,162 @@ def get_price_info(price_id):
         print(f"获取价格信息失败: {e}")
         return None
 
-# 获取价格信息
-ONE_TIME_PRICE_INFO = get_price_info(PRICE_ONE_TIME)
-MONTHLY_PRICE_INFO = get_price_info(PRICE_SUB_MONTHLY)
+def get_price_info(price_id):
+    """按需获取价格信息，结果缓存 PRICE_CACHE_TTL 秒，失败结果不缓存"""
+    cached = _price_cache.get(price_id)
+    if cached and time.monotonic() - cached[1] < PRICE_CACHE_TTL:
+        return cached[0]
+    
+    info = fetch_price_info(price_id)
+    if info is not None:
+        _price_cache[price_id] = (info, time.monotonic())
+    return info
+
+# 订单存储：SQLite（WAL 模式），多个 worker 进程共享，重启后不丢失
+ORDERS_DB = os.getenv("ORDERS_DB", "orders.db")
+
+def get_db():
+    """获取当前应用上下文的数据库连接"""
+    if 'db' not in g:
+        g.db = sqlite3.connect(ORDERS_DB, timeout=10)
+        g.db.row_factory = sqlite3.Row
+        g.db.execute("PRAGMA synchronous=NORMAL")
+    return g.db
+
+@app.teardown_appcontext
+def close_db(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+def init_db():
+    db = get_db()
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            quantity INTEGER,
+            price_id TEXT,
+            trial_days INTEGER,
+            status TEXT NOT NULL,
+            payment_status TEXT NOT NULL,
+            session_id TEXT UNIQUE
+        )
+    """)
+    db.commit()
+
+with app.app_context():
+    init_db()
+
+def row_to_order(row):
+    """数据库行 -> 订单字典（省略空字段，与原内存订单格式一致）"""
+    order = {'id': row['order_id']}
+    for key in ('type', 'quantity', 'price_id', 'trial_days', 'status', 'payment_status', 'session_id'):
+        if row[key] is not None:
+            order[key] = row[key]
+    return order
+
+def create_order(order_id, order_type, price_id, quantity=None, trial_days=None):
+    db = get_db()
+    db.execute(
+        "INSERT INTO orders (order_id, type, quantity, price_id, trial_days, status, payment_status) "
+        "VALUES (?, ?, ?, ?, ?, 'pending', 'unpaid')",
+        (order_id, order_type, quantity, price_id, trial_days)
+    )
+    db.commit()
+
+def set_order_session(order_id, session_id):
+    db = get_db()
+    db.execute("UPDATE orders SET session_id = ? WHERE order_id = ?", (session_id, order_id))
+    db.commit()
+
+def get_order(order_id):
+    row = get_db().execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+    return row_to_order(row) if row else None
+
+def get_order_by_session(session_id):
+    row = get_db().execute("SELECT * FROM orders WHERE session_id = ?", (session_id,)).fetchone()
+    return row_to_order(row) if row else None
+
+def list_orders():
+    return [row_to_order(row) for row in get_db().execute("SELECT * FROM orders ORDER BY rowid")]
+
+def checkout_session_completed(data):
+    session_id = data.get('id')
+    payment_status = data.get('payment_status')
+    mode = data.get('mode')
+    
+    app.logger.info(f"Checkout session completed: {session_id}, payment_status: {payment_status}, mode: {mode}")
+    
+    # 更新订单状态为已支付（由事件处理线程批量提交）
+    cursor = get_db().execute(
+        "UPDATE orders SET status = 'paid', payment_status = ? WHERE session_id = ?",
+        (payment_status, session_id)
+    )
+    if cursor.rowcount:
+        app.logger.info(f"Order for session {session_id} marked as paid")
+
+def subscription_updated(subscription: stripe.Subscription):
+    app.logger.info(f"Subscription updated: {subscription.id}")
+    # 处理订阅更新逻辑
+
+def subscription_deleted(subscription: stripe.Subscription):
+    app.logger.info(f"Subscription deleted: {subscription.id}")
+    # 处理订阅删除逻辑
+
+def invoice_payment_succeeded(invoice: stripe.Invoice):
+    app.logger.info(f"Invoice payment succeeded: {invoice.id}")
+    # 处理发票支付成功逻辑
+
+def invoice_payment_failed(invoice: stripe.Invoice):
+    app.logger.info(f"Invoice payment failed: {invoice.id}")
+    # 处理发票支付失败逻辑
 
-# 简单的内存数据库存储订单信息
-orders = {}
+# 事件类型 -> 处理函数
+EVENT_HANDLERS = {
+    # 结账完成，无论一次性还是订阅
+    "checkout.session.completed": checkout_session_completed,
+    # 订阅更新
+    "customer.subscription.updated": subscription_updated,
+    # 订阅删除
+    "customer.subscription.deleted": subscription_deleted,
+    # 支付成功
+    "invoice.payment_succeeded": invoice_payment_succeeded,
+    # 支付失败
+    "invoice.payment_failed": invoice_payment_failed,
+}
+
+# Webhook事件队列：请求线程只做签名校验和入队，后台线程处理事件
+event_queue = queue.Queue()
+
+def process_events():
+    while True:
+        # 取出当前积压的所有事件，在一个事务中处理并提交
+        events = [event_queue.get()]
+        while True:
+            try:
+                events.append(event_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        with app.app_context():
+            for et, data in events:
+                try:
+                    handler = EVENT_HANDLERS.get(et)
+                    if handler:
+                        handler(data)
+                except Exception:
+                    app.logger.exception(f"处理事件失败: {et}")
+            try:
+                get_db().commit()
+            except sqlite3.Error:
+                app.logger.exception("提交事件处理结果失败")
+        
+        for _ in events:
+            event_queue.task_done()
+
+threading.Thread(target=process_events, daemon=True, name="webhook-worker").start()
 
 # Webhook：确认事件并更新你自己的数据库
 @app.post("/webhook")
@@ -61,55 +221,10 @@ def stripe_webhook():
 
     et = event["type"]
     data = event["data"]["object"]
-    print(f'event type: {et}, event object: {data}')
-    
-    def checkout_session_completed():
-        session_id = data.get('id')
-        payment_status = data.get('payment_status')
-        mode = data.get('mode')
-        
-        print(f"Checkout session completed: {session_id}, payment_status: {payment_status}, mode: {mode}")
-        
-        # 更新订单状态为已支付
-        for order_id, order in orders.items():
-            if order.get('session_id') == session_id:
-                order['status'] = 'paid'
-                order['payment_status'] = payment_status
-                print(f"Order {order_id} marked as paid")
-                break
-    
-    def subscription_updated(subscription: stripe.Subscription):
-        print(f"Subscription updated: {subscription.id}")
-        # 处理订阅更新逻辑
-    
-    def subscription_deleted(subscription: stripe.Subscription):
-        print(f"Subscription deleted: {subscription.id}")
-        # 处理订阅删除逻辑
+    app.logger.info(f'event type: {et}, event object: {data}')
     
-    def invoice_payment_succeeded(invoice: stripe.Invoice):
-        print(f"Invoice payment succeeded: {invoice.id}")
-        # 处理发票支付成功逻辑
-    
-    def invoice_payment_failed(invoice: stripe.Invoice):
-        print(f"Invoice payment failed: {invoice.id}")
-        # 处理发票支付失败逻辑
-
-    # 结账完成，无论一次性还是订阅
-    if et == "checkout.session.completed":
-        checkout_session_completed()
-    # 订阅更新
-    elif et == 'customer.subscription.updated':
-        subscription_updated(data)
-    # 订阅删除
-    elif et == 'customer.subscription.deleted':
-        subscription_deleted(data)
-    # 支付成功
-    elif et == 'invoice.payment_succeeded':
-        invoice_payment_succeeded(data)
-    # 支付失败
-    elif et == 'invoice.payment_failed':
-        invoice_payment_failed(data)
-        
+    # 先确认收到，再异步处理
+    event_queue.put((et, data))
     return "", 200
 
 # 一次性购买：创建 Checkout Session，mode=payment
@@ -125,14 +240,7 @@ def create_one_time_checkout():
 
     # 创建订单记录
     order_id = str(uuid.uuid4())
-    orders[order_id] = {
-        'id': order_id,
-        'type': 'one_time',
-        'quantity': quantity,
-        'price_id': price_id,
-        'status': 'pending',
-        'payment_status': 'unpaid'
-    }
+    create_order(order_id, 'one_time', price_id, quantity=quantity)
 
     session = stripe.checkout.Session.create(
         customer_email=DEFAULT_EMAIL,
@@ -144,7 +252,7 @@ def create_one_time_checkout():
     )
     
     # 保存session_id到订单
-    orders[order_id]['session_id'] = session.id
+    set_order_session(order_id, session.id)
     
     return jsonify({"url": session.url, "order_id": order_id})
     
@@ -161,14 +269,7 @@ def create_sub_checkout():
 
     # 创建订阅订单记录
     order_id = str(uuid.uuid4())
-    orders[order_id] = {
-        'id': order_id,
-        'type': 'subscription',
-        'price_id': price_id,
-        'trial_days': trial_days,
-        'status': 'pending',
-        'payment_status': 'unpaid'
-    }
+    create_order(order_id, 'subscription', price_id, trial_days=trial_days)
 
     session = stripe.checkout.Session.create(
         customer_email=DEFAULT_EMAIL,
@@ -181,29 +282,30 @@ def create_sub_checkout():
     )
     
     # 保存session_id到订单
-    orders[order_id]['session_id'] = session.id
+    set_order_session(order_id, session.id)
     
     return jsonify({"url": session.url, "order_id": order_id})
 
 # 获取订单状态
 @app.get("/api/order/<order_id>")
 def get_order_status(order_id):
-    if order_id not in orders:
+    order = get_order(order_id)
+    if order is None:
         return jsonify({"error": "Order not found"}), 404
     
-    return jsonify(orders[order_id])
+    return jsonify(order)
 
 # 获取所有订单
 @app.get("/api/orders")
 def get_all_orders():
-    return jsonify(list(orders.values()))
+    return jsonify(list_orders())
 
 # 获取价格信息
 @app.get("/api/prices")
 def get_prices():
     return jsonify({
-        'one_time': ONE_TIME_PRICE_INFO,
-        'monthly': MONTHLY_PRICE_INFO
+        'one_time': get_price_info(PRICE_ONE_TIME),
+        'monthly': get_price_info(PRICE_SUB_MONTHLY)
     })
     
 # 成功和取消页
@@ -212,238 +314,13 @@ def success():
     session_id = request.args.get('session_id')
     
     # 查找对应的订单
-    order = None
-    for o in orders.values():
-        if o.get('session_id') == session_id:
-            order = o
-            break
-    
-    if order:
-        return f"""
-        <!DOCTYPE html>
-        <html lang="zh-CN">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>支付成功</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    max-width: 600px;
-                    margin: 50px auto;
-                    padding: 20px;
-                    text-align: center;
-                    background-color: #f5f5f5;
-                }}
-                .success-container {{
-                    background: white;
-                    padding: 40px;
-                    border-radius: 10px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                }}
-                .success-icon {{
-                    font-size: 64px;
-                    color: #27ae60;
-                    margin-bottom: 20px;
-                }}
-                h1 {{
-                    color: #27ae60;
-                    margin-bottom: 20px;
-                }}
-                .order-info {{
-                    background: #f8f9fa;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin: 20px 0;
-                    text-align: left;
-                }}
-                .btn {{
-                    background: #3498db;
-                    color: white;
-                    padding: 12px 24px;
-                    border: none;
-                    border-radius: 5px;
-                    cursor: pointer;
-                    font-size: 16px;
-                    margin: 10px;
-                    text-decoration: none;
-                    display: inline-block;
-                }}
-                .btn:hover {{
-                    background: #2980b9;
-                }}
-                .auto-redirect {{
-                    color: #666;
-                    font-size: 14px;
-                    margin-top: 20px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="success-container">
-                <div class="success-icon">✅</div>
-                <h1>支付成功！</h1>
-                <p>感谢您的购买，您的订单已成功处理。</p>
-                
-                <div class="order-info">
-                    <h3>订单详情</h3>
-                    <p><strong>订单ID:</strong> {order['id']}</p>
-                    <p><strong>订单类型:</strong> {'一次性购买' if order['type'] == 'one_time' else '订阅'}</p>
-                    <p><strong>数量:</strong> {order.get('quantity', 1)}</p>
-                    <p><strong>支付状态:</strong> <span style="color: #27ae60;">已支付</span></p>
-                    <p><strong>Session ID:</strong> {session_id}</p>
-                </div>
-                
-                <a href="/" class="btn">返回购物页面</a>
-                <a href="/api/orders" class="btn">查看所有订单</a>
-                
-                <div class="auto-redirect">
-                    <p>5秒后自动跳转到购物页面...</p>
-                </div>
-            </div>
-            
-            <script>
-                // 5秒后自动跳转
-                setTimeout(function() {{
-                    window.location.href = '/';
-                }}, 5000);
-            </script>
-        </body>
-        </html>
-        """
-    else:
-        return f"""
-        <!DOCTYPE html>
-        <html lang="zh-CN">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>支付成功</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    max-width: 600px;
-                    margin: 50px auto;
-                    padding: 20px;
-                    text-align: center;
-                    background-color: #f5f5f5;
-                }}
-                .success-container {{
-                    background: white;
-                    padding: 40px;
-                    border-radius: 10px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                }}
-                .success-icon {{
-                    font-size: 64px;
-                    color: #27ae60;
-                    margin-bottom: 20px;
-                }}
-                h1 {{
-                    color: #27ae60;
-                    margin-bottom: 20px;
-                }}
-                .btn {{
-                    background: #3498db;
-                    color: white;
-                    padding: 12px 24px;
-                    border: none;
-                    border-radius: 5px;
-                    cursor: pointer;
-                    font-size: 16px;
-                    margin: 10px;
-                    text-decoration: none;
-                    display: inline-block;
-                }}
-                .btn:hover {{
-                    background: #2980b9;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="success-container">
-                <div class="success-icon">✅</div>
-                <h1>支付成功！</h1>
-                <p>感谢您的购买，您的订单已成功处理。</p>
-                <p>Session ID: {session_id}</p>
-                
-                <a href="/" class="btn">返回购物页面</a>
-                <a href="/api/orders" class="btn">查看所有订单</a>
-            </div>
-        </body>
-        </html>
-        """
+    order = get_order_by_session(session_id)
+    return render_template('success.html', order=order, session_id=session_id)
 
 
 @app.get("/cancel")
 def cancel():
-    return """
-    <!DOCTYPE html>
-    <html lang="zh-CN">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>支付取消</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                max-width: 600px;
-                margin: 50px auto;
-                padding: 20px;
-                text-align: center;
-                background-color: #f5f5f5;
-            }
-            .cancel-container {
-                background: white;
-                padding: 40px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }
-            .cancel-icon {
-                font-size: 64px;
-                color: #e74c3c;
-                margin-bottom: 20px;
-            }
-            h1 {
-                color: #e74c3c;
-                margin-bottom: 20px;
-            }
-            .btn {
-                background: #3498db;
-                color: white;
-                padding: 12px 24px;
-                border: none;
-                border-radius: 5px;
-                cursor: pointer;
-                font-size: 16px;
-                margin: 10px;
-                text-decoration: none;
-                display: inline-block;
-            }
-            .btn:hover {
-                background: #2980b9;
-            }
-            .btn-primary {
-                background: #27ae60;
-            }
-            .btn-primary:hover {
-                background: #229954;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="cancel-container">
-            <div class="cancel-icon">❌</div>
-            <h1>支付已取消</h1>
-            <p>您取消了支付流程，没有产生任何费用。</p>
-            <p>如果您需要帮助或有任何问题，请随时联系我们。</p>
-            
-            <a href="/" class="btn btn-primary">重新购买</a>
-            <a href="/api/orders" class="btn">查看订单</a>
-        </div>
-    </body>
-    </html>
-    """
+    return render_template('cancel.html')
 
 # 主页
 @app.get("/")
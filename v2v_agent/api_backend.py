@@ -1,36 +1,201 @@
-import base64
+import asyncio
+import functools
+import json
+import mmap
 import tempfile
+import threading
 import os
-import wave
-from typing import Optional, Dict, Any, Generator
+import struct
+from collections import deque
+from typing import Optional, Dict, Any, AsyncGenerator
+
+import httpx
 from zhipuai import ZhipuAI
 
+try:
+    from pybase64 import b64decode, b64encode  # SIMD 加速的 base64 编解码
+except ImportError:  # 可选依赖，未安装时使用标准库
+    from base64 import b64decode, b64encode
+
+# 临时音频文件目录，默认使用系统临时目录；可通过 GLM_TMP_DIR 指定内存盘（如 /dev/shm），
+# 此时 web_demo 会把该目录加入 Gradio 的 allowed_paths
+TMP_DIR = os.environ.get("GLM_TMP_DIR") or None
+if TMP_DIR and not os.path.isdir(TMP_DIR):
+    TMP_DIR = None
+
+class WavTmpPool:
+    """循环复用一组临时 WAV 文件路径，避免每次回复都新建临时文件并不断占满 /tmp
+    
+    使用中的路径不会被复用：没有空闲路径时新建临时文件，调用方在 Gradio
+    复制完音频之后通过 release 归还路径。
+    """
+    
+    def __init__(self, max_free: int = 32, suffix: str = '.wav'):
+        self.max_free = max_free
+        self.suffix = suffix
+        self._in_use = set()
+        self._free = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> str:
+        with self._lock:
+            if self._free:
+                path = self._free.pop()
+            else:
+                fd, path = tempfile.mkstemp(suffix=self.suffix, dir=TMP_DIR)
+                os.close(fd)
+            self._in_use.add(path)
+        return path
+    
+    def release(self, path: Optional[str]):
+        """归还路径：清空文件内容后放回空闲列表，空闲列表已满时删除文件"""
+        with self._lock:
+            if path not in self._in_use:
+                return
+            self._in_use.discard(path)
+            if len(self._free) < self.max_free:
+                open(path, 'wb').close()
+                self._free.append(path)
+                return
+        os.remove(path)
+    
+    def open(self):
+        """获取一个路径并以带缓冲的写模式打开，返回 (路径, 文件对象)"""
+        path = self.acquire()
+        return path, open(path, 'wb', buffering=1 << 20)
+
+# 所有临时音频文件都从这里分配
+wav_pool = WavTmpPool()
+
+# base64解码分块大小（必须是4的倍数），约解码为48KB数据
+B64_CHUNK_CHARS = 64 * 1024
+
+def write_base64_to_tempfile(audio_data: str) -> str:
+    """分块解码base64并直接写入临时文件，避免在内存中保留完整的解码数据
+    
+    路径来自 wav_pool，调用方用完文件后需调用 wav_pool.release 归还
+    """
+    path, tmp_file = wav_pool.open()
+    with tmp_file:
+        for start in range(0, len(audio_data), B64_CHUNK_CHARS):
+            tmp_file.write(b64decode(audio_data[start:start + B64_CHUNK_CHARS], validate=False))
+    return path
+
+# 单声道、16位、44.1kHz PCM 的 44 字节 WAV 文件头，只有两个长度字段随数据变化
+WAV_CHANNELS = 1
+WAV_SAMPLE_WIDTH = 2
+WAV_FRAME_RATE = 44100
+_WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+_WAV_FMT = struct.Struct('<HHIIHH')
+_DEFAULT_WAV_FMT = _WAV_FMT.pack(
+    1, WAV_CHANNELS, WAV_FRAME_RATE,
+    WAV_FRAME_RATE * WAV_CHANNELS * WAV_SAMPLE_WIDTH, WAV_CHANNELS * WAV_SAMPLE_WIDTH, WAV_SAMPLE_WIDTH * 8
+)
+_RIFF_CHUNK = struct.Struct('<4sI')
+
+def build_wav_header(data_size: int, fmt: bytes = _DEFAULT_WAV_FMT) -> bytes:
+    """构造 PCM WAV 文件头，fmt 为 16 字节的 fmt 块内容（默认单声道、16位、44.1kHz）"""
+    return _WAV_HEADER.pack(b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, *_WAV_FMT.unpack(fmt), b'data', data_size)
+
+def split_wav(blob: bytes):
+    """拆分 WAV 数据，返回 (fmt 块内容, PCM 数据)；不是 RIFF 格式时按原始 PCM 处理"""
+    if blob[:4] != b'RIFF' or blob[8:12] != b'WAVE':
+        return None, blob
+    fmt = None
+    pos = 12
+    while pos + _RIFF_CHUNK.size <= len(blob):
+        chunk_id, size = _RIFF_CHUNK.unpack_from(blob, pos)
+        body_start = pos + _RIFF_CHUNK.size
+        if chunk_id == b'fmt ':
+            fmt = blob[body_start:body_start + _WAV_FMT.size]
+        elif chunk_id == b'data':
+            # 流式返回的 data 长度字段可能是占位值，直接取到末尾
+            return fmt, blob[body_start:body_start + size]
+        pos = body_start + size + (size & 1)
+    return fmt, b''
+
+class WavStreamWriter:
+    """把流式返回的多个 WAV 音频块依次写入同一个文件，关闭时补写文件头"""
+    
+    def __init__(self):
+        self.path, self.file = wav_pool.open()
+        self.file.write(build_wav_header(0))
+        self.fmt = None
+        self.data_size = 0
+    
+    def write(self, blob: bytes):
+        fmt, pcm = split_wav(blob)
+        if self.fmt is None and fmt and len(fmt) == _WAV_FMT.size:
+            self.fmt = fmt
+        self.file.write(pcm)
+        self.data_size += len(pcm)
+    
+    def close(self) -> str:
+        self.file.seek(0)
+        self.file.write(build_wav_header(self.data_size, self.fmt or _DEFAULT_WAV_FMT))
+        self.file.close()
+        return self.path
+
+@functools.lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """所有 API 客户端共享的 HTTP 连接池，多轮对话复用 keep-alive 连接，避免每轮重新握手"""
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=8),
+        timeout=httpx.Timeout(300.0, connect=10.0),
+    )
+
+@functools.lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """异步 HTTP 连接池，供 AsyncGLM4VoiceAPI 在事件循环中并发处理多个会话"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+        timeout=httpx.Timeout(300.0, connect=10.0),
+    )
+
+@functools.lru_cache(maxsize=32)
+def _encode_file_base64(path: str, mtime_ns: int, size: int) -> str:
+    """通过 mmap 零拷贝读取文件并编码为base64，按 (路径, 修改时间, 大小) 缓存"""
+    if size == 0:
+        return ""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # 编码器顺序读取整个文件，提示内核加大预读
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        return b64encode(mm).decode('ascii')
+
+# 消息内容模板，每次请求只复制模板并填入数据
+_AUDIO_PART_TMPL = {"type": "input_audio", "input_audio": {"data": None, "format": "wav"}}
+_TEXT_PART_TMPL = {"type": "text", "text": None}
+
+def audio_content(audio_base64: str) -> list:
+    """构造音频输入的消息内容"""
+    part = _AUDIO_PART_TMPL.copy()
+    part["input_audio"] = {**_AUDIO_PART_TMPL["input_audio"], "data": audio_base64}
+    return [part]
+
+def text_content(text: str) -> list:
+    """构造文本输入的消息内容"""
+    return [{**_TEXT_PART_TMPL, "text": text}]
+
+def user_message(content) -> list:
+    """构造只包含一条用户消息的消息列表"""
+    return [{"role": "user", "content": content}]
+
 class GLM4VoiceAPI:
     def __init__(self, api_key: str):
-        self.client = ZhipuAI(api_key=api_key)
+        self.client = ZhipuAI(api_key=api_key, http_client=get_http_client())
     
-    def audio_to_base64(self, audio_path: str) -> str:
+    @staticmethod
+    def audio_to_base64(audio_path: str) -> str:
         """将音频文件转换为base64字符串"""
         try:
-            with open(audio_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
-                return base64.b64encode(audio_data).decode('utf-8')
+            # 同一文件在多轮对话中会重复上传，文件未变化时直接复用编码结果
+            st = os.stat(audio_path)
+            return _encode_file_base64(audio_path, st.st_mtime_ns, st.st_size)
         except Exception as e:
             print(f"Error converting audio to base64: {e}")
             return ""
     
-    def save_audio_as_wav(self, audio_data: bytes, filepath: str):
-        """保存音频数据为WAV文件"""
-        try:
-            with wave.open(filepath, 'wb') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(44100)
-                wav_file.writeframes(audio_data)
-            print(f"Audio saved to {filepath}")
-        except Exception as e:
-            print(f"Error saving audio: {e}")
-    
     def process_audio_input(self, audio_path: str) -> Optional[str]:
         """处理音频输入，返回文本（仅用于转录）"""
         try:
@@ -42,20 +207,7 @@ class GLM4VoiceAPI:
             # 调用GLM-4-voice API
             response = self.client.chat.completions.create(
                 model="glm-4-voice",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "input_audio",
-                                "input_audio": {
-                                    "data": audio_base64,
-                                    "format": "wav"
-                                }
-                            }
-                        ]
-                    }
-                ],
+                messages=user_message(audio_content(audio_base64)),
                 max_tokens=1024,
                 stream=False
             )
@@ -70,145 +222,131 @@ class GLM4VoiceAPI:
             print(f"Error processing audio input: {e}")
             return f"音频处理错误: {str(e)}"
     
-    def unified_chat(self, input_type: str, input_content: str) -> Dict[str, Any]:
-        """统一的聊天接口，支持音频和文本输入，返回音频和文本"""
-        try:
-            # 准备消息内容
-            if input_type == "audio":
-                # 音频输入
-                audio_base64 = self.audio_to_base64(input_content)
-                if not audio_base64:
-                    return {"error": "音频文件读取失败"}
-                
-                message_content = [
-                    {
-                        "type": "input_audio",
-                        "input_audio": {
-                            "data": audio_base64,
-                            "format": "wav"
-                        }
-                    }
-                ]
-            else:
-                # 文本输入
-                message_content = [
-                    {
-                        "type": "text",
-                        "text": input_content
-                    }
-                ]
+    @staticmethod
+    def build_message_content(input_type: str, input_content: str) -> Optional[list]:
+        """构造用户消息内容，音频文件读取失败时返回None"""
+        if input_type == "audio":
+            # 音频输入
+            audio_base64 = GLM4VoiceAPI.audio_to_base64(input_content)
+            if not audio_base64:
+                return None
             
-            # 调用GLM-4-voice API
+            return audio_content(audio_base64)
+        
+        # 文本输入
+        return text_content(input_content)
+    
+    def get_text_response(self, text: str) -> str:
+        """获取文本响应"""
+        try:
             response = self.client.chat.completions.create(
-                model="glm-4-voice",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": message_content
-                    }
-                ],
+                model="glm-4",
+                messages=user_message(text),
                 max_tokens=1024,
-                stream=False
+                temperature=0.7
             )
             
-            # 处理响应
-            result = {
-                "text": None,
-                "audio_path": None,
-                "audio_id": None,
-                "error": None
-            }
-            
-            if response.choices and response.choices[0].message:
-                message = response.choices[0].message
+            if response.choices and response.choices[0].message.content:
+                return response.choices[0].message.content
+            else:
+                return "抱歉，我无法理解您的问题。"
                 
-                # 提取文本内容
-                if hasattr(message, 'content') and message.content:
-                    result["text"] = message.content
+        except Exception as e:
+            print(f"Error getting text response: {e}")
+            return f"文本响应错误: {str(e)}"
+
+class AsyncGLM4VoiceAPI:
+    """GLM4VoiceAPI 的异步版本，直接通过 httpx.AsyncClient 调用 HTTP 接口
+    
+    zhipuai SDK 没有提供 asyncio 客户端，同步调用会占住 Gradio 的工作线程；
+    异步请求可以让多个会话在同一个事件循环中并发进行。
+    """
+    
+    API_URL = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+    
+    def __init__(self, api_key: str):
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.client = get_async_http_client()
+    
+    async def create(self, **payload) -> Dict[str, Any]:
+        """非流式调用，返回解析后的JSON响应"""
+        response = await self.client.post(self.API_URL, headers=self.headers, json=payload)
+        response.raise_for_status()
+        return response.json()
+    
+    async def unified_chat_deltas(self, input_type: str, input_content: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """流式统一聊天接口（SSE），逐块返回文本和音频增量"""
+        # 读取并编码音频文件是阻塞操作，放到线程中执行
+        message_content = await asyncio.to_thread(
+            GLM4VoiceAPI.build_message_content, input_type, input_content
+        )
+        if message_content is None:
+            yield {"type": "error", "message": "音频文件读取失败"}
+            return
+        
+        payload = {
+            "model": "glm-4-voice",
+            "messages": user_message(message_content),
+            "max_tokens": 1024,
+            "stream": True
+        }
+        
+        async with self.client.stream("POST", self.API_URL, headers=self.headers, json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
                 
-                # 提取音频内容
-                if hasattr(message, 'audio') and message.audio:
-                    audio_data = message.audio['data']
-                    decoded_data = base64.b64decode(audio_data)
-                    
-                    # 保存到临时文件
-                    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                        tmp_file.write(decoded_data)
-                        result["audio_path"] = tmp_file.name
-                    
-                    # 提取音频ID（如果存在）
-                    if 'id' in message.audio:
-                        result["audio_id"] = message.audio['id']
+                choices = json.loads(data).get("choices")
+                if not choices:
+                    continue
+                delta = choices[0].get("delta") or {}
                 
-                # 如果既没有文本也没有音频，返回错误
-                if not result["text"] and not result["audio_path"]:
-                    result["error"] = "API未返回有效内容"
-            else:
-                result["error"] = "API调用失败"
-            
-            return result
+                if delta.get("content"):
+                    yield {"type": "text", "text": delta["content"]}
                 
-        except Exception as e:
-            print(f"Error in unified chat: {e}")
-            return {"error": f"聊天错误: {str(e)}"}
+                audio = delta.get("audio")
+                if audio and audio.get("data"):
+                    yield {"type": "audio", "data": audio["data"], "audio_id": audio.get("id")}
     
-    def generate_audio_response(self, text: str) -> Optional[str]:
+    async def generate_audio_response(self, text: str) -> Optional[str]:
         """根据文本生成音频响应"""
         try:
-            response = self.client.chat.completions.create(
+            response = await self.create(
                 model="glm-4-voice",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": text
-                            }
-                        ]
-                    }
-                ],
+                messages=user_message(text_content(text)),
                 max_tokens=1024,
                 stream=False
             )
             
-            # 检查是否有音频响应
-            if response.choices and response.choices[0].message.audio:
-                audio_data = response.choices[0].message.audio['data']
-                decoded_data = base64.b64decode(audio_data)
-                
-                # 保存到临时文件
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                    tmp_file.write(decoded_data)
-                    return tmp_file.name
-            else:
-                # 如果没有音频响应，返回None
-                print("No audio response received from API")
-                return None
+            choices = response.get("choices")
+            audio = choices[0]["message"].get("audio") if choices else None
+            if audio:
+                return write_base64_to_tempfile(audio["data"])
+            print("No audio response received from API")
+            return None
                 
         except Exception as e:
             print(f"Error generating audio response: {e}")
             return None
     
-    def get_text_response(self, text: str) -> str:
+    async def get_text_response(self, text: str) -> str:
         """获取文本响应"""
         try:
-            response = self.client.chat.completions.create(
+            response = await self.create(
                 model="glm-4",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
+                messages=user_message(text),
                 max_tokens=1024,
                 temperature=0.7
             )
             
-            if response.choices and response.choices[0].message.content:
-                return response.choices[0].message.content
-            else:
-                return "抱歉，我无法理解您的问题。"
+            choices = response.get("choices")
+            if choices and choices[0]["message"].get("content"):
+                return choices[0]["message"]["content"]
+            return "抱歉，我无法理解您的问题。"
                 
         except Exception as e:
             print(f"Error getting text response: {e}")
@@ -217,22 +355,27 @@ class GLM4VoiceAPI:
 class ModelWorker:
     def __init__(self, api_key: str):
         self.api_client = GLM4VoiceAPI(api_key)
+        self.async_client = AsyncGLM4VoiceAPI(api_key)
     
-    def generate_stream(self, prompt: str, max_new_tokens: int = 100, **kwargs) -> Generator[Dict[str, Any], None, None]:
+    async def generate_stream(self, prompt: str, max_new_tokens: int = 100, **kwargs) -> AsyncGenerator[Dict[str, Any], None]:
         """生成流式响应"""
         try:
             # 尝试生成音频响应
-            audio_path = self.api_client.generate_audio_response(prompt)
+            audio_path = await self.async_client.generate_audio_response(prompt)
             
             if audio_path:
-                yield {
-                    "type": "audio",
-                    "data": audio_path,
-                    "text": prompt
-                }
+                try:
+                    yield {
+                        "type": "audio",
+                        "data": audio_path,
+                        "text": prompt
+                    }
+                finally:
+                    # 调用方已经处理完音频文件，归还给临时文件池
+                    wav_pool.release(audio_path)
             else:
-                # 如果音频生成失败，尝试获取文本响应
-                text_response = self.api_client.get_text_response(prompt)
+                # 如果音频生成失败，返回文本响应
+                text_response = await self.async_client.get_text_response(prompt)
                 yield {
                     "type": "text",
                     "data": text_response
@@ -244,24 +387,57 @@ class ModelWorker:
                 "message": f"生成错误: {str(e)}"
             }
     
-    def unified_chat_stream(self, input_type: str, input_content: str) -> Generator[Dict[str, Any], None, None]:
-        """统一的聊天流式响应"""
+    async def unified_chat_stream(self, input_type: str, input_content: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """统一的聊天流式响应：每个音频块到达即返回，结束时返回完整文本和音频"""
+        text_parts = []
+        audio_id = None
+        writer = None
+        prev_chunk_path = None
         try:
-            # 调用统一聊天接口
-            result = self.api_client.unified_chat(input_type, input_content)
+            async for delta in self.async_client.unified_chat_deltas(input_type, input_content):
+                if delta["type"] == "error":
+                    yield delta
+                    return
+                
+                if delta["type"] == "text":
+                    text_parts.append(delta["text"])
+                    continue
+                
+                # 每个音频块单独保存用于实时播放，同时追加到完整音频文件
+                audio_bytes = b64decode(delta["data"], validate=False)
+                chunk_path, chunk_file = wav_pool.open()
+                with chunk_file:
+                    chunk_file.write(audio_bytes)
+                if writer is None:
+                    writer = WavStreamWriter()
+                writer.write(audio_bytes)
+                audio_id = delta["audio_id"] or audio_id
+                
+                yield {
+                    "type": "unified_chunk",
+                    "text": "".join(text_parts),
+                    "audio_path": chunk_path
+                }
+                # 下一个音频块已经交给 Gradio，上一个音频块的路径可以归还
+                wav_pool.release(prev_chunk_path)
+                prev_chunk_path = chunk_path
+            
+            text = "".join(text_parts) or None
+            audio_path = writer.close() if writer else None
+            writer = None
             
-            if result.get("error"):
+            if not text and not audio_path:
                 yield {
                     "type": "error",
-                    "message": result["error"]
+                    "message": "API未返回有效内容"
                 }
             else:
-                # 同时返回文本和音频
+                # 同时返回完整的文本和音频
                 yield {
                     "type": "unified",
-                    "text": result.get("text"),
-                    "audio_path": result.get("audio_path"),
-                    "audio_id": result.get("audio_id")
+                    "text": text,
+                    "audio_path": audio_path,
+                    "audio_id": audio_id
                 }
                 
         except Exception as e:
@@ -269,13 +445,18 @@ class ModelWorker:
                 "type": "error",
                 "message": f"统一聊天错误: {str(e)}"
             }
+        finally:
+            wav_pool.release(prev_chunk_path)
+            if writer is not None:
+                # 出错时未返回给界面的完整音频文件直接归还
+                wav_pool.release(writer.close())
     
     def process_audio(self, audio_path: str) -> Optional[str]:
         """处理音频文件"""
         return self.api_client.process_audio_input(audio_path)
 
 # 测试函数
-def test_api():
+async def test_api():
     """测试API功能"""
     api_key = os.getenv("GLM_API_KEY")
     if not api_key:
@@ -285,7 +466,7 @@ def test_api():
     
     # 测试文本生成
     print("测试文本生成...")
-    for result in worker.generate_stream("你好，请介绍一下你自己"):
+    async for result in worker.generate_stream("你好，请介绍一下你自己"):
         print(f"结果类型: {result['type']}")
         if result['type'] == 'audio':
             print(f"音频文件: {result['data']}")
@@ -295,4 +476,4 @@ def test_api():
             print(f"错误: {result['message']}")
 
 if __name__ == "__main__":
-    test_api()
+    asyncio.run(test_api())
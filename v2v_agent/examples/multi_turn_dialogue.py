@@ -1,13 +1,10 @@
-import wave
 import base64
+from pathlib import Path
 
 from zhipuai import ZhipuAI
 def save_audio_as_wav(audio_data, filepath):
-    with wave.open(filepath, 'wb') as wav_file:
-        wav_file.setnchannels(1)
-        wav_file.setsampwidth(2)
-        wav_file.setframerate(44100)
-        wav_file.writeframes(audio_data)
+    # The API already returns a complete WAV file, so write the bytes as-is
+    Path(filepath).write_bytes(audio_data)
     print(f"Audio saved to {filepath}")
 
 
@@ -51,6 +48,4 @@ print(response)
 # Get audio data
 audio_data = response.choices[0].message.audio['data']
 decoded_data = base64.b64decode(audio_data)
-# Write the decoded data to a WAV file
-with open("output.wav", 'wb') as wav_file:
-    wav_file.write(decoded_data)
\ No newline at end of file
+save_audio_as_wav(decoded_data, "output.wav")
\ No newline at end of file
@@ -1,14 +1,11 @@
-import wave
 import base64
+from pathlib import Path
 
 from zhipuai import ZhipuAI
 
 def save_audio_as_wav(audio_data, filepath):
-    with wave.open(filepath, 'wb') as wav_file:
-        wav_file.setnchannels(1)
-        wav_file.setsampwidth(2)
-        wav_file.setframerate(44100)
-        wav_file.writeframes(audio_data)
+    # The API already returns a complete WAV file, so write the bytes as-is
+    Path(filepath).write_bytes(audio_data)
     print(f"Audio saved to {filepath}")
 
 
@@ -44,10 +41,8 @@ for chunk in response:
         audio_value_data = audio.data
         if audio_value_data is not None:
             decoded_data = base64.b64decode(audio_value_data)
-            # Write the decoded data to a WAV file
-            with open(filename, 'wb') as wav_file:
-                wav_file.write(decoded_data)
-                i = i + 1
+            save_audio_as_wav(decoded_data, filename)
+            i = i + 1
     else:
         content = delta.content
         print(content)
\ No newline at end of file
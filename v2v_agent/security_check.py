@@ -3,50 +3,139 @@
 安全检查脚本 - 确保没有敏感信息被提交到代码仓库
 """
 
+import functools
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import hyperscan
+except ImportError:  # 可选依赖，未安装时只使用 re
+    hyperscan = None
+
+# 敏感信息模式（均限定在单行内匹配）
+SENSITIVE_PATTERNS = [
+    r'[a-f0-9]{32}\.[a-zA-Z0-9]{20}',  # API密钥格式
+    r'api[_-]?key["\']?[^\S\n]*[:=][^\S\n]*["\'][^"\'\n]+["\']',  # API密钥赋值
+    r'secret["\']?[^\S\n]*[:=][^\S\n]*["\'][^"\'\n]+["\']',  # 密钥赋值
+    r'token["\']?[^\S\n]*[:=][^\S\n]*["\'][^"\'\n]+["\']',  # 令牌赋值
+    r'password["\']?[^\S\n]*[:=][^\S\n]*["\'][^"\'\n]+["\']',  # 密码赋值
+]
+
+# 所有模式合并为一个预编译的正则，每个文件只扫描一遍
+SENSITIVE_RE = re.compile('|'.join(f'(?:{p})' for p in SENSITIVE_PATTERNS), re.IGNORECASE)
+
+# 包含这些关键字的行视为示例代码
+EXAMPLE_KEYWORDS = ('example', 'your-', 'placeholder', 'template')
+
+@functools.lru_cache(maxsize=1)
+def build_hyperscan_db():
+    """把所有模式编译为一个 Hyperscan 数据库，用作快速预筛选（每个进程编译一次）"""
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[p.encode('utf-8') for p in SENSITIVE_PATTERNS],
+        ids=list(range(len(SENSITIVE_PATTERNS))),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8] * len(SENSITIVE_PATTERNS),
+    )
+    return db
+
+def may_contain_sensitive(db, content):
+    """一次 DFA 扫描判断内容中是否可能有敏感信息；没有 Hyperscan 时总是返回 True"""
+    if db is None:
+        return True
+    matched = []
+    db.scan(content.encode('utf-8'), match_event_handler=lambda *args: matched.append(args[0]))
+    return bool(matched)
+
+def scan_content(file_path, content):
+    """扫描文件内容，返回包含敏感信息的行（每行最多报告一次）"""
+    issues = []
+    line_no = 1
+    line_start = 0
+    last_reported = 0
+    
+    for match in SENSITIVE_RE.finditer(content):
+        pos = match.start()
+        line_no += content.count('\n', line_start, pos)
+        line_start = content.rfind('\n', 0, pos) + 1
+        if line_no == last_reported:
+            continue
+        last_reported = line_no
+        
+        line_end = content.find('\n', pos)
+        line = content[line_start:line_end if line_end != -1 else len(content)]
+        # 检查是否是示例代码
+        if not any(keyword in line.lower() for keyword in EXAMPLE_KEYWORDS):
+            issues.append(f"{file_path}:{line_no} - {line.strip()}")
+    
+    return issues
+
+# 超过该大小的文件（如生成的 JSON 数据）直接跳过
+MAX_FILE_SIZE = 2 * 1024 * 1024
+# 读取文件开头的字节数，用于判断是否为二进制文件
+BINARY_SNIFF_BYTES = 4096
+
+def scan_file(file_path):
+    """检查单个文件，返回 (敏感信息列表, 读取错误)；跳过过大的文件和二进制文件"""
+    try:
+        if os.path.getsize(file_path) > MAX_FILE_SIZE:
+            return [], None
+        with open(file_path, 'rb') as f:
+            head = f.read(BINARY_SNIFF_BYTES)
+            if b'\x00' in head:
+                return [], None
+            content = (head + f.read()).decode('utf-8', 'replace')
+    except Exception as e:
+        return [], str(e)
+    # 大多数文件不含敏感信息，由 Hyperscan 快速排除，命中后再用 re 定位具体行
+    if not may_contain_sensitive(build_hyperscan_db(), content):
+        return [], None
+    return scan_content(file_path, content), None
+
+# 文件数达到该值时使用多进程扫描，文件较少时进程启动开销更大
+PARALLEL_MIN_FILES = 64
+
+# 要检查的文件类型
+FILE_EXTENSIONS = ('.py', '.sh', '.md', '.txt', '.json', '.yaml', '.yml')
+
+# 要忽略的目录
+IGNORE_DIRS = {'venv', '__pycache__', '.git', 'node_modules'}
+
+def iter_candidate_files(top='.'):
+    """用 os.scandir 遍历目录树，返回需要检查的文件路径"""
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # 过滤忽略的目录
+                    if entry.name not in IGNORE_DIRS:
+                        stack.append(entry.path)
+                elif entry.name.endswith(FILE_EXTENSIONS) and entry.is_file():
+                    yield Path(entry.path)
+
 def check_sensitive_info():
     """检查代码中是否包含敏感信息"""
     print("🔍 开始安全检查...")
     
-    # 敏感信息模式
-    sensitive_patterns = [
-        r'[a-f0-9]{32}\.[a-zA-Z0-9]{20}',  # API密钥格式
-        r'api[_-]?key["\']?\s*[:=]\s*["\'][^"\']+["\']',  # API密钥赋值
-        r'secret["\']?\s*[:=]\s*["\'][^"\']+["\']',  # 密钥赋值
-        r'token["\']?\s*[:=]\s*["\'][^"\']+["\']',  # 令牌赋值
-        r'password["\']?\s*[:=]\s*["\'][^"\']+["\']',  # 密码赋值
-    ]
-    
-    # 要检查的文件类型
-    file_extensions = ['.py', '.sh', '.md', '.txt', '.json', '.yaml', '.yml']
-    
-    # 要忽略的目录
-    ignore_dirs = {'venv', '__pycache__', '.git', 'node_modules'}
-    
     issues = []
+    file_paths = list(iter_candidate_files())
     
-    for root, dirs, files in os.walk('.'):
-        # 过滤忽略的目录
-        dirs[:] = [d for d in dirs if d not in ignore_dirs]
-        
-        for file in files:
-            if any(file.endswith(ext) for ext in file_extensions):
-                file_path = Path(root) / file
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        for i, line in enumerate(content.split('\n'), 1):
-                            for pattern in sensitive_patterns:
-                                if re.search(pattern, line, re.IGNORECASE):
-                                    # 检查是否是示例代码
-                                    if not any(keyword in line.lower() for keyword in ['example', 'your-', 'placeholder', 'template']):
-                                        issues.append(f"{file_path}:{i} - {line.strip()}")
-                except Exception as e:
-                    print(f"⚠️  无法读取文件 {file_path}: {e}")
+    if len(file_paths) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(scan_file, file_paths, chunksize=32))
+    else:
+        results = [scan_file(file_path) for file_path in file_paths]
+    
+    for file_path, (file_issues, error) in zip(file_paths, results):
+        if error is not None:
+            print(f"⚠️  无法读取文件 {file_path}: {error}")
+        issues.extend(file_issues)
     
     if issues:
         print("❌ 发现潜在敏感信息:")
@@ -79,10 +168,9 @@ def check_gitignore():
         '__pycache__/',
     ]
     
-    missing_patterns = []
-    for pattern in required_patterns:
-        if pattern not in content:
-            missing_patterns.append(pattern)
+    # 按行比较规则，一次拆分后用集合查找
+    lines = {line.strip() for line in content.splitlines() if not line.startswith('#')}
+    missing_patterns = [p for p in required_patterns if p not in lines]
     
     if missing_patterns:
         print(f"❌ .gitignore缺少以下模式: {missing_patterns}")
@@ -1,26 +1,24 @@
 import json
 import os.path
-import tempfile
 import sys
 import re
 import uuid
 import requests
 from argparse import ArgumentParser
+from collections import deque
 import gradio as gr
-import torch
-import torchaudio
-from transformers import WhisperFeatureExtractor, AutoTokenizer
 
 # Import our new API backend
-from api_backend_v2 import ModelWorker
+from api_backend import ModelWorker, TMP_DIR, wav_pool
 
 # Global variables
-glm_tokenizer = None
 api_worker = None
-whisper_model, feature_extractor = None, None
+
+# 每个会话最多保留的消息条数，超出后丢弃最早的消息
+MAX_HISTORY_MESSAGES = 200
 
 def initialize_fn():
-    global api_worker, feature_extractor, whisper_model, glm_tokenizer
+    global api_worker
     
     if api_worker is not None:
         return
@@ -31,29 +29,15 @@ def initialize_fn():
         raise gr.Error("请设置GLM_API_KEY环境变量")
     
     api_worker = ModelWorker(api_key)
-    
-    # Initialize tokenizer for text processing
-    try:
-        glm_tokenizer = AutoTokenizer.from_pretrained("THUDM/glm-4-voice-tokenizer", trust_remote_code=True)
-    except Exception as e:
-        print(f"Warning: Could not load tokenizer: {e}")
-        glm_tokenizer = None
-    
-    # Initialize Whisper for audio processing (if needed)
-    try:
-        feature_extractor = WhisperFeatureExtractor.from_pretrained("openai/whisper-base")
-    except Exception as e:
-        print(f"Warning: Could not load Whisper feature extractor: {e}")
-        feature_extractor = None
 
-def inference_fn(
+async def inference_fn(
     user_input,
     history,
     input_mode,
     audio_path,
     **kwargs
 ):
-    global api_worker, glm_tokenizer
+    global api_worker
     
     if api_worker is None:
         initialize_fn()
@@ -72,9 +56,18 @@ def inference_fn(
         
         # 使用统一聊天接口
         audio_status = "正在处理..."
+        streaming_message = None
         
-        for result in api_worker.unified_chat_stream(input_type, input_content):
-            if result["type"] == "unified":
+        async for result in api_worker.unified_chat_stream(input_type, input_content):
+            if result["type"] == "unified_chunk":
+                # 流式音频块：立即播放，并实时更新回复文本
+                if streaming_message is None:
+                    streaming_message = {"role": "assistant", "content": ""}
+                    history.append(streaming_message)
+                streaming_message["content"] = result.get("text") or "[音频生成中...]"
+                yield history, "", "正在生成音频...", result.get("audio_path"), None
+            
+            elif result["type"] == "unified":
                 # 统一响应：同时包含文本和音频
                 response_text = result.get("text")
                 audio_response_path = result.get("audio_path")
@@ -89,8 +82,11 @@ def inference_fn(
                     else:
                         reply_content = f"[音频回复: {audio_response_path}]"
                 
-                # 添加到历史
-                history.append({"role": "assistant", "content": reply_content})
+                # 添加到历史（流式输出时替换占位消息）
+                if streaming_message is not None:
+                    streaming_message["content"] = reply_content
+                else:
+                    history.append({"role": "assistant", "content": reply_content})
                 
                 # 更新状态
                 if audio_response_path and response_text:
@@ -102,12 +98,17 @@ def inference_fn(
                 else:
                     audio_status = "无有效回复"
                 
-                yield history, "", audio_status, audio_response_path, audio_response_path
+                # 已经流式播放过的音频不再重复推送到实时播放器
+                live_audio = None if streaming_message is not None else audio_response_path
+                yield history, "", audio_status, live_audio, audio_response_path
                 return
                 
             elif result["type"] == "error":
                 audio_status = f"错误: {result['message']}"
-                history.append({"role": "assistant", "content": f"错误: {result['message']}"})
+                if streaming_message is not None:
+                    streaming_message["content"] = f"错误: {result['message']}"
+                else:
+                    history.append({"role": "assistant", "content": f"错误: {result['message']}"})
                 yield history, "", audio_status, None, None
                 return
         
@@ -140,6 +141,10 @@ def create_interface():
                     show_copy_button=True,
                     type="messages"
                 )
+                # 对话历史保存在有界 deque 中，追加为 O(1) 且不会无限增长
+                history = gr.State(value=deque(maxlen=MAX_HISTORY_MESSAGES))
+                # 本会话上一轮生成的完整音频文件，下一轮开始或清空对话时归还给临时文件池
+                reply_audio = gr.State(value=[])
                 
                 with gr.Row():
                     with gr.Column(scale=4):
@@ -208,15 +213,23 @@ def create_interface():
         
         def user(user_message, history, input_mode, audio_path):
             if input_mode == "audio" and audio_path is not None:
-                return "", history + [{"role": "user", "content": f"[音频: {audio_path}]"}]
+                history.append({"role": "user", "content": f"[音频: {audio_path}]"})
+                return "", list(history), history
             elif input_mode == "text" and user_message:
-                return "", history + [{"role": "user", "content": user_message}]
+                history.append({"role": "user", "content": user_message})
+                return "", list(history), history
             else:
-                return user_message, history
+                return user_message, list(history), history
         
-        def bot(history, input_mode, audio_path):
+        async def bot(history, reply_audio, input_mode, audio_path):
+            # 上一轮的完整音频已经由 Gradio 复制到缓存目录，归还临时文件
+            for path in reply_audio:
+                wav_pool.release(path)
+            reply_audio.clear()
+            
             if not history:
-                return history, "", "等待输入...", None, None
+                yield [], "", "等待输入...", None, None
+                return
             
             last_message = history[-1]
             if isinstance(last_message["content"], str) and last_message["content"].startswith("[音频转录]"):
@@ -229,38 +242,45 @@ def create_interface():
                 if input_mode == "text":
                     audio_path = None
             
-            for history, msg, audio_status, output_audio, complete_audio in inference_fn(
+            async for history, msg, audio_status, output_audio, complete_audio in inference_fn(
                 user_input, history, input_mode, audio_path
             ):
-                yield history, msg, audio_status, output_audio, complete_audio
+                if complete_audio:
+                    reply_audio.append(complete_audio)
+                # 只在输出给界面时转换为列表
+                yield list(history), msg, audio_status, output_audio, complete_audio
         
         send_btn.click(
             user,
-            inputs=[msg, chatbot, input_mode, audio_path],
-            outputs=[msg, chatbot],
+            inputs=[msg, history, input_mode, audio_path],
+            outputs=[msg, chatbot, history],
             queue=False
         ).then(
             bot,
-            inputs=[chatbot, input_mode, audio_path],
+            inputs=[history, reply_audio, input_mode, audio_path],
             outputs=[chatbot, msg, audio_status, output_audio, complete_audio]
         )
         
         msg.submit(
             user,
-            inputs=[msg, chatbot, input_mode, audio_path],
-            outputs=[msg, chatbot],
+            inputs=[msg, history, input_mode, audio_path],
+            outputs=[msg, chatbot, history],
             queue=False
         ).then(
             bot,
-            inputs=[chatbot, input_mode, audio_path],
+            inputs=[history, reply_audio, input_mode, audio_path],
             outputs=[chatbot, msg, audio_status, output_audio, complete_audio]
         )
         
-        def clear_conversation():
-            """清空对话历史"""
+        def clear_conversation(history, reply_audio):
+            """清空对话历史，并归还本会话的完整音频文件"""
+            history.clear()
+            for path in reply_audio:
+                wav_pool.release(path)
+            reply_audio.clear()
             return [], "", "对话历史已清空", None, None
         
-        clear_btn.click(clear_conversation, outputs=[chatbot, msg, audio_status, output_audio, complete_audio])
+        clear_btn.click(clear_conversation, inputs=[history, reply_audio], outputs=[chatbot, msg, audio_status, output_audio, complete_audio])
     
     return demo
 
@@ -280,5 +300,7 @@ if __name__ == "__main__":
     demo = create_interface()
     demo.launch(
         server_port=args.port,
-        server_name=args.host
+        server_name=args.host,
+        # Gradio 只允许返回 cwd、系统临时目录和 allowed_paths 下的文件
+        allowed_paths=[TMP_DIR] if TMP_DIR else None
     )
@@ -7,12 +7,237 @@ Final Complete Amazon Workflow - Robust version:
 4. Review search for ALL products with proper browser management
 """
 
-import json
+import logging
 import os
 import time
 import re
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def final_complete_workflow(search_term="smart lock", max_products=3, rating_filter=5, next_pages=1):
+from patchright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+
+from json_store import write_json_atomic
+
+# Per-card extraction details; the step banners and summary stay on print
+log = logging.getLogger(__name__)
+
+# Regexes used for every product card, compiled once at import time
+_RATING_RE = re.compile(r'(\d+\.?\d*)')
+# Review counts: the "34.8K" / "1.2M" form is searched over the whole text first,
+# plain counts like "1,234" only when it is absent
+_REVIEW_KM_RE = re.compile(r'([\d,]+\.?\d*[KMkm])')
+_REVIEW_RE = re.compile(r'([\d,]+)')
+
+# Reads the first `limit` search result cards in the browser. Name, ASIN and URL are
+# picked there; price, rating and review count come back as candidate texts and are
+# parsed in Python. Fields whose fallback selectors all point at the same kind of
+# node use one union selector (candidates in document order), the rest keep their
+# priority order
+_EXTRACT_CARDS_JS = """(cards, limit) => cards.slice(0, limit).map(el => {
+    const texts = (selectors, read) => selectors.map(sel => {
+        const node = el.querySelector(sel);
+        return node ? read(node) : null;
+    });
+    const all = (selector, read) => Array.from(el.querySelectorAll(selector), read);
+    const text = node => node.textContent.trim();
+    // ASIN and absolute URL from the first product link whose href holds /dp/<ASIN>
+    let asin = null, url = null;
+    for (const href of all('h2 a, .a-link-normal, a[href*="/dp/"]', node => node.getAttribute('href'))) {
+        const match = href && href.match(/\/dp\/([A-Z0-9]{10})/);
+        if (match) {
+            asin = match[1];
+            url = href.startsWith('/') ? 'https://www.amazon.com' + href : href;
+            break;
+        }
+    }
+    // Product name: first title-like text in document order ("h2 a span" is covered by "h2 span")
+    const name = all(':is(h2 span, .a-size-mini span, .a-size-base-plus, [data-cy="title-recipe-title"], .s-size-mini span)', text)
+        .find(candidate => candidate.length > 10 && !candidate.startsWith('$')) || null;
+    return {
+        name: name,
+        asin: asin,
+        url: url,
+        priceWhole: texts(['.a-price-whole'], text)[0],
+        priceFraction: texts(['.a-price-fraction'], text)[0],
+        offscreenPrices: all('.a-offscreen', text),
+        ratings: all('.a-icon-alt, [aria-label*="stars"], .a-star-mini .a-icon-alt',
+                     node => node.textContent || node.getAttribute('aria-label') || ''),
+        reviews: texts(['a[href*="#customerReviews"]', '.a-size-base', 'span[aria-label*="stars"]',
+                        '.a-link-normal[href*="reviews"]'], node => node.textContent),
+    };
+})"""
+
+# Cards read per wanted product, to leave room for cards without a valid name/ASIN
+CARD_SCAN_FACTOR = 3
+
+def parse_price(card):
+    """Parse the card price from whole+fraction parts, falling back to the offscreen price text"""
+    price_text = card['priceWhole']
+    if price_text:
+        # Look for fraction part
+        if card['priceFraction']:
+            price_text = f"{price_text}.{card['priceFraction']}"
+        # Fix double dots issue (e.g., "39..99" -> "39.99")
+        try:
+            return float(price_text.replace('..', '.'))
+        except ValueError:
+            pass
+    
+    for price_text in card['offscreenPrices']:
+        if price_text and ('$' in price_text or '.' in price_text):
+            # Clean price text and convert to number
+            try:
+                return float(price_text.replace('$', '').replace(',', ''))
+            except ValueError:
+                continue
+    return "N/A"
+
+def parse_rating(rating_texts):
+    """Return the first value in the valid 1-5 range found in the rating texts"""
+    for rating_text in rating_texts:
+        rating_match = _RATING_RE.search(rating_text or '')
+        if rating_match:
+            rating_val = float(rating_match.group(1))
+            if 1 <= rating_val <= 5:  # Valid rating range
+                return rating_val
+    return "N/A"
+
+def parse_review_count(review_texts):
+    """Return the first review count like "34.8K", "1.2M" or "1,234" found in the texts"""
+    for review_text in review_texts:
+        review_text = review_text or ''
+        review_match = _REVIEW_KM_RE.search(review_text) or _REVIEW_RE.search(review_text)
+        if review_match:
+            return review_match.group(1)
+    return "N/A"
+
+# Max number of products whose reviews are crawled at the same time
+MAX_REVIEW_WORKERS = 4
+
+# Saved login session, reused while younger than LOGIN_STATE_MAX_AGE seconds
+LOGIN_STATE_FILE = "data/.amazon_state.json"
+LOGIN_STATE_MAX_AGE = 24 * 3600
+
+# Requests the scraper never reads: heavy resources and tracking beacons
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media", "stylesheet")
+BLOCKED_URL_PARTS = ("doubleclick", "google-analytics", "amazon-adsystem", "fls-na.amazon")
+
+def block_heavy_resources(context):
+    """Abort image, font, media, stylesheet and tracker requests for every page of the context"""
+    def handle(route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(part in request.url for part in BLOCKED_URL_PARTS):
+            route.abort()
+        else:
+            route.continue_()
+    
+    context.route("**/*", handle)
+
+def has_fresh_login_state():
+    """Check whether a saved login session exists and is recent enough to reuse"""
+    try:
+        return time.time() - os.path.getmtime(LOGIN_STATE_FILE) < LOGIN_STATE_MAX_AGE
+    except OSError:
+        return False
+
+def scrape_product_reviews(review_component, product, index, total, rating_filter, next_pages, legacy_files=False):
+    """
+    Crawl the reviews of one product with an already logged-in review component
+    
+    Returns:
+        tuple: (review result entry for the final summary, list of extracted reviews)
+    """
+    print(f"\n📍 Processing Product {index}/{total}: {product['name'][:40]}...")
+    print(f"   ⭐ Star Filter: {rating_filter} stars")
+    print(f"   📄 Pages: {next_pages + 1} total")
+    
+    try:
+        review_component.load_product(product['asin'], product['url'])
+        
+        # Run review search
+        if review_component.run_review_search_flow():
+            review_count = len(review_component.reviews)
+            print(f"   ✅ [{product['asin']}] Extracted {review_count} reviews ({rating_filter}-star)")
+            
+            return {
+                'product_name': product['name'],
+                'asin': product['asin'],
+                'star_rating': rating_filter,
+                'review_count': review_count,
+                'filename': f"reviews_{product['asin']}_{rating_filter}.json" if legacy_files else None,
+                'status': 'success'
+            }, review_component.reviews
+        
+        print(f"   ❌ [{product['asin']}] Failed to extract reviews")
+        return {
+            'product_name': product['name'],
+            'asin': product['asin'],
+            'star_rating': rating_filter,
+            'review_count': 0,
+            'filename': None,
+            'status': 'failed'
+        }, []
+        
+    except Exception as e:
+        print(f"   ❌ [{product['asin']}] Error: {e}")
+        return {
+            'product_name': product['name'],
+            'asin': product['asin'],
+            'star_rating': rating_filter,
+            'review_count': 0,
+            'filename': None,
+            'status': 'error',
+            'error': str(e)
+        }, []
+
+def review_worker(tasks, results, results_lock, total, storage_state, rating_filter, next_pages,
+                  headless=False, legacy_files=False):
+    """
+    Crawl products from the task queue in one browser, logged in via storage_state
+    
+    Playwright's sync API is bound to the thread that started it, so every worker
+    thread runs its own Playwright instance instead of sharing the login browser.
+    The worker keeps one browser and one review component for all of its products.
+    """
+    from review_search_component_simple import AmazonReviewSearchComponentSimple
+    
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=headless)
+        context = browser.new_context(storage_state=storage_state)
+        block_heavy_resources(context)
+        
+        review_component = AmazonReviewSearchComponentSimple(
+            asin=None,
+            product_url=None,
+            headless=headless,
+            rating_filter=rating_filter,
+            next_pages=next_pages,
+            save_to_file=legacy_files,
+            page=context.new_page()
+        )
+        
+        try:
+            while True:
+                try:
+                    index, product = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                
+                outcome = scrape_product_reviews(
+                    review_component, product, index, total, rating_filter, next_pages, legacy_files
+                )
+                with results_lock:
+                    results[index - 1] = outcome
+        finally:
+            browser.close()
+
+def save_all_reviews(all_reviews, path):
+    """Write the reviews of every product to one JSON file, keyed by ASIN, with a single fsync"""
+    write_json_atomic(path, all_reviews, fsync=True)
+
+def final_complete_workflow(search_term="smart lock", max_products=3, rating_filter=5, next_pages=1,
+                            legacy_files=False):
     """
     Final complete workflow with robust product extraction and review search
     
@@ -21,6 +246,7 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         max_products (int): Number of top products to extract
         rating_filter (int): Star rating to filter reviews (1-5)
         next_pages (int): Number of additional pages to scrape for reviews
+        legacy_files (bool): Also write one reviews_<ASIN>_<rating>.json file per product
     """
     
     print("🚀 Final Complete Amazon Workflow")
@@ -37,44 +263,59 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         from login_component import AmazonLoginComponent
         
         login_component = AmazonLoginComponent(headless=False)
-        login_component.start_browser()
         
-        # Manual login steps
-        if not login_component.step1_enter_homepage():
-            print("❌ Failed to enter homepage")
-            return False
-        
-        sign_in_found, sign_in_element, sign_in_selector = login_component.step2_check_sign_in()
-        if not sign_in_found:
-            print("✅ Already logged in, logging out first...")
-            login_component.logout()
-            time.sleep(2)
-            # Re-check after logout
+        # Warm start: restore the saved session and skip steps 1-8 if it is still logged in
+        logged_in = False
+        if has_fresh_login_state():
+            print(f"♻️ Reusing saved login session from {LOGIN_STATE_FILE}...")
+            login_component.start_browser(storage_state=LOGIN_STATE_FILE)
+            login_component.page.goto("https://www.amazon.com", wait_until='domcontentloaded', timeout=15000)
+            logged_in = login_component.is_logged_in()
+            if not logged_in:
+                print("⚠️ Saved session is no longer logged in, running full login...")
+                login_component.page.context.clear_cookies()
+        else:
+            login_component.start_browser()
+        
+        if not logged_in:
+            # Manual login steps
+            if not login_component.step1_enter_homepage():
+                print("❌ Failed to enter homepage")
+                return False
+            
             sign_in_found, sign_in_element, sign_in_selector = login_component.step2_check_sign_in()
-        
-        if not login_component.step3_hover_and_click(sign_in_element, sign_in_selector):
-            print("❌ Failed to hover and click sign in")
-            return False
-        
-        if not login_component.step4_enter_email():
-            print("❌ Failed to enter email")
-            return False
-        
-        if not login_component.step5_click_continue():
-            print("❌ Failed to click continue")
-            return False
-        
-        if not login_component.step6_enter_password():
-            print("❌ Failed to enter password")
-            return False
-        
-        if not login_component.step7_click_sign_in():
-            print("❌ Failed to click sign in")
-            return False
-        
-        if not login_component.step8_check_success():
-            print("❌ Login failed")
-            return False
+            if not sign_in_found:
+                print("✅ Already logged in, logging out first...")
+                login_component.logout()
+                time.sleep(2)
+                # Re-check after logout
+                sign_in_found, sign_in_element, sign_in_selector = login_component.step2_check_sign_in()
+            
+            if not login_component.step3_hover_and_click(sign_in_element, sign_in_selector):
+                print("❌ Failed to hover and click sign in")
+                return False
+            
+            if not login_component.step4_enter_email():
+                print("❌ Failed to enter email")
+                return False
+            
+            if not login_component.step5_click_continue():
+                print("❌ Failed to click continue")
+                return False
+            
+            if not login_component.step6_enter_password():
+                print("❌ Failed to enter password")
+                return False
+            
+            if not login_component.step7_click_sign_in():
+                print("❌ Failed to click sign in")
+                return False
+            
+            if not login_component.step8_check_success():
+                print("❌ Login failed")
+                return False
+            
+            login_component.save_storage_state(LOGIN_STATE_FILE)
         
         print("✅ Login successful!")
         
@@ -82,13 +323,18 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         print(f"\n🔍 Step 2: Searching for '{search_term}' using search bar...")
         
         page = login_component.page
+        # Login is done, so the hover menus no longer need styles
+        block_heavy_resources(page.context)
         
         # Navigate to Amazon homepage if not already there
         current_url = page.url
         if "amazon.com" not in current_url or "/ap/" in current_url or "/claim" in current_url:
             print("🏠 Navigating to Amazon homepage...")
             page.goto("https://www.amazon.com", wait_until='domcontentloaded', timeout=15000)
-            time.sleep(2)
+            try:
+                page.wait_for_load_state('networkidle', timeout=8000)
+            except PlaywrightTimeoutError:
+                print("⚠️ Network still busy, continuing...")
         
         # Find and use search box directly
         print("🔍 Finding search box...")
@@ -104,214 +350,73 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         
         # Wait for results
         page.wait_for_selector('[data-component-type="s-search-result"]', timeout=10000)
-        time.sleep(3)
+        # Continue as soon as enough result cards are rendered
+        try:
+            page.wait_for_function(
+                """n => document.querySelectorAll('[data-component-type="s-search-result"]').length >= n""",
+                arg=max_products,
+                timeout=8000
+            )
+        except PlaywrightTimeoutError:
+            print(f"⚠️ Fewer than {max_products} results rendered, continuing...")
         print(f"✅ Search results loaded")
         
         # Step 3: Extract Products with IMPROVED selectors
         print(f"🔍 Step 3: Extracting top {max_products} products...")
         
-        products = []
-        product_elements = page.query_selector_all('[data-component-type="s-search-result"]')
+        # Read every candidate field of the leading cards in one browser round-trip; some
+        # cards fail the name/ASIN checks, so scan a few times more than needed
+        cards = page.eval_on_selector_all(
+            '[data-component-type="s-search-result"]', _EXTRACT_CARDS_JS, max_products * CARD_SCAN_FACTOR
+        )
         
-        print(f"🔍 Found {len(product_elements)} product elements")
+        print(f"🔍 Scanning {len(cards)} product elements")
         
-        for i, element in enumerate(product_elements):
-            if len(products) >= max_products:
+        # Pass 1: pick the first max_products cards with a valid name and ASIN
+        selected = []
+        for i, card in enumerate(cards):
+            if len(selected) >= max_products:
                 break
                 
             try:
-                print(f"\n   🔍 Processing element {i+1}...")
-                
-                # Extract product name with multiple strategies
-                name = ""
-                name_strategies = [
-                    lambda el: el.query_selector('h2 a span'),
-                    lambda el: el.query_selector('h2 span'),
-                    lambda el: el.query_selector('.a-size-mini span'),
-                    lambda el: el.query_selector('.a-size-base-plus'),
-                    lambda el: el.query_selector('[data-cy="title-recipe-title"]'),
-                    lambda el: el.query_selector('.s-size-mini span')
-                ]
-                
-                for strategy in name_strategies:
-                    try:
-                        name_el = strategy(element)
-                        if name_el:
-                            candidate_name = name_el.text_content().strip()
-                            if candidate_name and len(candidate_name) > 10 and not candidate_name.startswith('$'):
-                                name = candidate_name
-                                print(f"      ✅ Name: {name[:50]}...")
-                                break
-                    except:
-                        continue
+                log.debug("Processing element %d", i + 1)
                 
+                # Name, ASIN and URL were already picked from the card in the browser
+                name = card['name']
                 if not name:
-                    print(f"      ❌ No valid name found")
+                    log.debug("Element %d: no valid name found", i + 1)
                     continue
                 
-                # Extract ASIN and URL from link with multiple strategies
-                url = ""
-                asin = ""
-                link_strategies = [
-                    lambda el: el.query_selector('h2 a'),
-                    lambda el: el.query_selector('.a-link-normal'),
-                    lambda el: el.query_selector('a[href*="/dp/"]')
-                ]
-                
-                for strategy in link_strategies:
-                    try:
-                        link_el = strategy(element)
-                        if link_el:
-                            href = link_el.get_attribute('href')
-                            if href and '/dp/' in href:
-                                url = f"https://www.amazon.com{href}" if href.startswith('/') else href
-                                # Extract ASIN from URL
-                                asin_match = re.search(r'/dp/([A-Z0-9]{10})', href)
-                                if asin_match:
-                                    asin = asin_match.group(1)
-                                    print(f"      ✅ ASIN: {asin}")
-                                    print(f"      ✅ URL: {url[:80]}...")
-                                    break
-                    except:
-                        continue
-                
+                asin = card['asin']
+                url = card['url']
                 if not asin or not url:
-                    print(f"      ❌ No valid ASIN/URL found")
+                    log.debug("Element %d: no valid ASIN/URL found", i + 1)
                     continue
                 
-                # Extract price with improved decimal handling
-                price = "N/A"
-                try:
-                    # First try to get whole price with fraction
-                    price_whole_el = element.query_selector('.a-price-whole')
-                    if price_whole_el:
-                        price_text = price_whole_el.text_content().strip()
-                        # Look for fraction part
-                        price_fraction_el = element.query_selector('.a-price-fraction')
-                        if price_fraction_el:
-                            fraction_text = price_fraction_el.text_content().strip()
-                            price_text = f"{price_text}.{fraction_text}"
-                        
-                        # Clean and validate
-                        if price_text:
-                            # Fix double dots issue (e.g., "39..99" -> "39.99")
-                            price_text = price_text.replace('..', '.')
-                            # Convert to number
-                            try:
-                                price = float(price_text)
-                                print(f"      ✅ Price: ${price}")
-                            except ValueError:
-                                price = "N/A"
-                                print(f"      ⚠️ Could not parse price: {price_text}")
-                        else:
-                            price = "N/A"
-                    
-                    # Fallback strategies if whole+fraction didn't work
-                    if price == "N/A":
-                        price_strategies = [
-                            lambda el: el.query_selector('.a-offscreen'),
-                            lambda el: el.query_selector('.a-price .a-offscreen'),
-                            lambda el: el.query_selector('.a-price-range .a-offscreen')
-                        ]
-                        
-                        for strategy in price_strategies:
-                            try:
-                                price_el = strategy(element)
-                                if price_el:
-                                    price_text = price_el.text_content().strip()
-                                    if price_text and ('$' in price_text or '.' in price_text):
-                                        # Clean price text and convert to number
-                                        clean_price = price_text.replace('$', '').replace(',', '')
-                                        try:
-                                            price = float(clean_price)
-                                            print(f"      ✅ Price: ${price}")
-                                            break
-                                        except ValueError:
-                                            continue
-                            except:
-                                continue
-                except Exception as e:
-                    print(f"      ⚠️ Price extraction error: {e}")
-                    pass
-                
-                # Extract rating with multiple strategies
-                rating = "N/A"
-                rating_strategies = [
-                    lambda el: el.query_selector('.a-icon-alt'),
-                    lambda el: el.query_selector('[aria-label*="stars"]'),
-                    lambda el: el.query_selector('.a-star-mini .a-icon-alt')
-                ]
-                
-                for strategy in rating_strategies:
-                    try:
-                        rating_el = strategy(element)
-                        if rating_el:
-                            rating_text = rating_el.text_content() or rating_el.get_attribute('aria-label') or ''
-                            rating_match = re.search(r'(\d+\.?\d*)', rating_text)
-                            if rating_match:
-                                try:
-                                    rating_val = float(rating_match.group(1))
-                                    if 1 <= rating_val <= 5:  # Valid rating range
-                                        rating = rating_val
-                                        print(f"      ✅ Rating: {rating}")
-                                        break
-                                except:
-                                    continue
-                    except:
-                        continue
-                
-                # Extract review count with improved K/M suffix handling
-                review_count = "N/A"
-                review_strategies = [
-                    lambda el: el.query_selector('a[href*="#customerReviews"]'),
-                    lambda el: el.query_selector('.a-size-base'),
-                    lambda el: el.query_selector('span[aria-label*="stars"]'),
-                    lambda el: el.query_selector('.a-link-normal[href*="reviews"]')
-                ]
-                
-                for strategy in review_strategies:
-                    try:
-                        review_el = strategy(element)
-                        if review_el:
-                            review_text = review_el.text_content()
-                            if review_text:
-                                # Look for patterns like "34.8K", "1.2M", "1,234", etc.
-                                review_patterns = [
-                                    r'([\d,]+\.?\d*[KMkm])',  # 34.8K, 1.2M
-                                    r'([\d,]+)',              # 1,234
-                                ]
-                                
-                                for pattern in review_patterns:
-                                    review_matches = re.findall(pattern, review_text)
-                                    for match in review_matches:
-                                        if match:
-                                            review_count = match
-                                            print(f"      ✅ Review Count: {review_count}")
-                                            break
-                                    if review_count != "N/A":
-                                        break
-                                if review_count != "N/A":
-                                    break
-                    except:
-                        continue
-                
-                # Add valid product
-                product = {
-                    'rank': len(products) + 1,
-                    'name': name,
-                    'asin': asin,
-                    'url': url,
-                    'price': price,
-                    'rating': rating,
-                    'review_count': review_count
-                }
-                products.append(product)
-                print(f"      ✅ Added product #{len(products)}: {name[:40]}...")
+                # Numeric fields are parsed for the selected cards only, after the scan
+                selected.append((name, asin, url, card))
+                log.debug("Selected product #%d: %s %.40s", len(selected), asin, name)
                 
             except Exception as e:
-                print(f"      ❌ Error processing element {i+1}: {e}")
+                log.warning("Error processing element %d: %s", i + 1, e)
                 continue
         
+        # Pass 2: clean the raw price, rating and review count strings of the selected cards
+        products = []
+        for rank, (name, asin, url, card) in enumerate(selected, 1):
+            product = {
+                'rank': rank,
+                'name': name,
+                'asin': asin,
+                'url': url,
+                'price': parse_price(card),
+                'rating': parse_rating(card['ratings']),
+                'review_count': parse_review_count(card['reviews'])
+            }
+            products.append(product)
+            log.info("#%d %s | Price: %s | Rating: %s | Reviews: %s",
+                     rank, asin, product['price'], product['rating'], product['review_count'])
+        
         print(f"\n✅ Successfully extracted {len(products)} products")
         
         if len(products) == 0:
@@ -322,80 +427,59 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         # Save products to JSON
         os.makedirs("data", exist_ok=True)
         products_file = f"data/products_{search_term.replace(' ', '_')}_final.json"
-        with open(products_file, 'w', encoding='utf-8') as f:
-            json.dump(products, f, indent=2, ensure_ascii=False)
+        write_json_atomic(products_file, products)
         print(f"💾 Saved products to {products_file}")
         
         # Step 4: Review Search for ALL products (FIXED browser management)
         print(f"\n📝 Step 4: Extracting reviews for ALL products...")
-        from review_search_component_simple import AmazonReviewSearchComponentSimple
-        
-        review_results = []
+        # Share the logged-in session with every worker, then crawl products in parallel
+        storage_state = page.context.storage_state()
+        max_workers = min(len(products), MAX_REVIEW_WORKERS)
+        print(f"   🧵 Crawling {len(products)} products with {max_workers} parallel browsers")
         
+        tasks = queue.Queue()
         for i, product in enumerate(products, 1):
-            print(f"\n📍 Processing Product {i}/{len(products)}: {product['name'][:40]}...")
-            print(f"   ⭐ Star Filter: {rating_filter} stars")
-            print(f"   📄 Pages: {next_pages + 1} total")
-            
-            try:
-                # Create review search component
-                review_component = AmazonReviewSearchComponentSimple(
-                    asin=product['asin'],
-                    product_url=product['url'],
-                    headless=False,
-                    rating_filter=rating_filter,
-                    next_pages=next_pages
+            tasks.put((i, product))
+        
+        # Each slot holds (result entry, reviews); slots stay in product order for the summary
+        outcomes = [None] * len(products)
+        outcomes_lock = threading.Lock()
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            workers = [
+                executor.submit(
+                    review_worker, tasks, outcomes, outcomes_lock, len(products), storage_state,
+                    rating_filter, next_pages, login_component.headless, legacy_files
                 )
-                
-                # Use the SAME browser instance (CRITICAL FIX)
-                review_component.browser = login_component.browser
-                review_component.page = login_component.page
-                
-                # IMPORTANT: Don't let the component close the browser
-                original_close_method = review_component.close_browser
-                review_component.close_browser = lambda: print("   🔒 Skipping browser close (keeping for next product)")
-                
-                # Run review search
-                if review_component.run_review_search_flow():
-                    review_count = len(review_component.reviews)
-                    print(f"   ✅ Extracted {review_count} reviews ({rating_filter}-star)")
-                    
-                    review_results.append({
-                        'product_name': product['name'],
-                        'asin': product['asin'],
-                        'star_rating': rating_filter,
-                        'review_count': review_count,
-                        'filename': f"reviews_{product['asin']}_{rating_filter}.json",
-                        'status': 'success'
-                    })
-                else:
-                    print(f"   ❌ Failed to extract reviews")
-                    review_results.append({
-                        'product_name': product['name'],
-                        'asin': product['asin'],
-                        'star_rating': rating_filter,
-                        'review_count': 0,
-                        'filename': None,
-                        'status': 'failed'
-                    })
-                
-                # Restore original close method
-                review_component.close_browser = original_close_method
-                
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                review_results.append({
+                for _ in range(max_workers)
+            ]
+            for worker in workers:
+                try:
+                    worker.result()
+                except Exception as e:
+                    print(f"   ❌ Review worker failed: {e}")
+        
+        review_results = []
+        all_reviews = {}
+        for product, outcome in zip(products, outcomes):
+            if outcome is None:
+                outcome = ({
                     'product_name': product['name'],
                     'asin': product['asin'],
                     'star_rating': rating_filter,
                     'review_count': 0,
                     'filename': None,
                     'status': 'error',
-                    'error': str(e)
-                })
-                
-                # Continue with next product even if one fails
-                continue
+                    'error': 'review worker failed'
+                }, [])
+            result, reviews = outcome
+            review_results.append(result)
+            all_reviews[product['asin']] = reviews
+        
+        # Persist every product's reviews in one file
+        reviews_file = f"data/reviews_{search_term.replace(' ', '_')}_all.json"
+        save_all_reviews(all_reviews, reviews_file)
+        print(f"💾 Saved reviews of {len(all_reviews)} products to {reviews_file}")
         
         # Final Summary
         print("\n" + "=" * 60)
@@ -424,6 +508,7 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         
         print(f"\n📁 Generated Files:")
         print(f"   • {products_file}")
+        print(f"   • {reviews_file}")
         for result in review_results:
             if result['filename']:
                 print(f"   • data/{result['filename']}")
@@ -449,12 +534,24 @@ def final_complete_workflow(search_term="smart lock", max_products=3, rating_fil
         return False
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the complete Amazon workflow")
+    parser.add_argument("--legacy-files", action="store_true",
+                        help="also write one reviews_<ASIN>_<rating>.json file per product")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="log per-element extraction details")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="   %(message)s")
+    
     # Test the final workflow
     success = final_complete_workflow(
         search_term="smart lock",
         max_products=3,
         rating_filter=4,  # 4-star reviews this time
-        next_pages=1      # 2 total pages (1 base + 1 additional)
+        next_pages=1,     # 2 total pages (1 base + 1 additional)
+        legacy_files=args.legacy_files
     )
     
     if success:
@@ -4,6 +4,7 @@ Interactive Amazon Scraper
 Prompts user for search parameters and runs the complete workflow
 """
 
+import logging
 import sys
 from final_complete_workflow import final_complete_workflow
 
@@ -89,6 +90,8 @@ def display_summary(product_name, product_num, rating_filter, next_pages):
 def main():
     """Main interactive function"""
     
+    logging.basicConfig(level=logging.INFO, format="   %(message)s")
+    
     try:
         # Get user input
         product_name, product_num, rating_filter, next_pages = get_user_input()
@@ -114,10 +117,7 @@ def main():
             print("🎉 Interactive scraping completed successfully!")
             print("\n📁 Check the 'data' folder for generated files:")
             print(f"   • products_{product_name.replace(' ', '_')}_final.json")
-            if rating_filter:
-                print(f"   • reviews_[ASIN]_{rating_filter}.json (for each product)")
-            else:
-                print(f"   • reviews_[ASIN]_all.json (for each product)")
+            print(f"   • reviews_{product_name.replace(' ', '_')}_all.json (all products, keyed by ASIN)")
         else:
             print("❌ Interactive scraping failed!")
             print("   Please check the error messages above.")
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+JSON file writing shared by the workflow and the review component
+"""
+
+import os
+
+import orjson
+
+def write_json_atomic(path, data, fsync=False):
+    """
+    Serialize data with orjson into a temporary file, then rename it over path
+    
+    A crash mid-write leaves the previous file intact instead of a truncated one.
+    
+    Args:
+        path (str): Destination JSON file
+        data: JSON-serializable data
+        fsync (bool): Flush the file to disk before the rename
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
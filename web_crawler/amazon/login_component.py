@@ -5,6 +5,7 @@ Step-by-step login process with debug output
 """
 
 from patchright.sync_api import sync_playwright
+import os
 import time
 
 class AmazonLoginComponent:
@@ -19,13 +20,13 @@ class AmazonLoginComponent:
             self.email = lines[0]
             self.password = lines[1]
     
-    def start_browser(self):
-        """Start the browser"""
+    def start_browser(self, storage_state=None):
+        """Start the browser, optionally restoring cookies saved by save_storage_state()"""
         print("🚀 Starting browser...")
         try:
             playwright = sync_playwright().start()
             self.browser = playwright.chromium.launch(headless=self.headless)
-            self.page = self.browser.new_page()
+            self.page = self.browser.new_page(storage_state=storage_state)
             print("✅ Browser started")
             return True
         except Exception as e:
@@ -272,6 +273,28 @@ class AmazonLoginComponent:
             print(f"❌ Error checking login success: {e}")
             return False
     
+    def is_logged_in(self):
+        """Check the account greeting in the nav bar, which reads "Hello, sign in" when logged out"""
+        try:
+            greeting_el = self.page.wait_for_selector('#nav-link-accountList-nav-line-1', timeout=5000)
+            greeting = greeting_el.text_content().strip() if greeting_el else ""
+            print(f"🔍 Account greeting: '{greeting}'")
+            return bool(greeting) and "sign in" not in greeting.lower()
+        except Exception as e:
+            print(f"⚠️ Could not read account greeting: {e}")
+            return False
+    
+    def save_storage_state(self, path):
+        """Save the session cookies and local storage so later runs can skip the login steps"""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.page.context.storage_state(path=path)
+            print(f"💾 Saved login session to {path}")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not save login session: {e}")
+            return False
+    
     def logout(self):
         """Logout from Amazon to test full login flow"""
         print("\n📍 Logging out to test full login flow...")
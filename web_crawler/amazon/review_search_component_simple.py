@@ -5,11 +5,133 @@ Simple Amazon Review Search Component with working extraction logic
 
 from patchright.sync_api import sync_playwright
 import time
-import json
 import os
 
+from json_store import write_json_atomic
+
 class AmazonReviewSearchComponentSimple:
-    def __init__(self, asin, product_url, headless=True, rating_filter=None, next_pages=0):
+    # Selectors and lookup tables are shared by every product the component handles
+    REVIEW_LINK_SELECTORS = [
+        '#reviews-medley-footer',
+        '[data-hook="reviews-medley-footer"]',
+        'a[data-hook="see-all-reviews-link"]',
+        'a[data-hook="reviews-medley-footer"]',
+        'a:has-text("See all reviews")',
+        'a:has-text("See more reviews")',
+        '#reviews-medley-footer a',
+        '.a-link-emphasis',
+        'a[href*="#customerReviews"]',
+        '.a-link-normal[href*="reviews"]'
+    ]
+    
+    # Map rating numbers to URL filter names
+    RATING_FILTER_NAMES = {
+        5: 'five_star',
+        4: 'four_star',
+        3: 'three_star',
+        2: 'two_star',
+        1: 'one_star'
+    }
+    
+    DROPDOWN_SELECTORS = [
+        'select[name="filterByStar"]',
+        '#filter-info-section select',
+        '.a-dropdown-container'
+    ]
+    
+    NEXT_PAGE_SELECTORS = [
+        '.a-pagination .a-last',
+        'li.a-last a',
+        'a[aria-label="Next page"]',
+        '.a-pagination li:last-child a'
+    ]
+    
+    # Extracts the review cards of the current page; runs in the browser
+    EXTRACT_REVIEWS_JS = '''(pageNumber) => {
+        const reviewElements = document.querySelectorAll('[data-hook="review"]');
+        const reviews = [];
+        
+        reviewElements.forEach((element, index) => {
+            try {
+                // Simple extraction using working selectors
+                const nameEl = element.querySelector('.a-profile-name');
+                const reviewerName = nameEl ? nameEl.textContent.trim() : '';
+                
+                const textEl = element.querySelector('[data-hook="review-body"]');
+                const reviewText = textEl ? textEl.textContent.trim() : '';
+                
+                // Extract rating
+                let rating = 0;
+                const ratingEl = element.querySelector('.a-icon-alt');
+                if (ratingEl) {
+                    const ratingText = ratingEl.textContent || ratingEl.getAttribute('aria-label') || '';
+                    const ratingMatch = ratingText.match(/(\\d+\\.?\\d*)\\s*out\\s*of\\s*5|(\\d+\\.?\\d*)\\s*stars?/);
+                    if (ratingMatch) {
+                        const ratingValue = ratingMatch[1] || ratingMatch[2];
+                        rating = parseFloat(ratingValue);
+                    }
+                }
+                
+                // Extract title
+                let reviewTitle = '';
+                const titleEl = element.querySelector('[data-hook="review-title"]');
+                if (titleEl) {
+                    reviewTitle = titleEl.textContent.trim();
+                    // Remove rating part and clean up newlines
+                    reviewTitle = reviewTitle.replace(/\\d+\\.?\\d*\\s*out\\s*of\\s*5\\s*stars?[\\s\\n]*/gi, '');
+                    reviewTitle = reviewTitle.replace(/\\n+/g, ' ').trim();
+                }
+                
+                // Extract location and date
+                let location = '';
+                let date = '';
+                const dateLocationEl = element.querySelector('[data-hook="review-date"]');
+                if (dateLocationEl) {
+                    const dateLocationText = dateLocationEl.textContent.trim();
+                    const fullMatch = dateLocationText.match(/Reviewed\\s+in\\s+([^\\s]+(?:\\s+[^\\s]+)*)\\s+on\\s+(.+)/i);
+                    if (fullMatch) {
+                        location = fullMatch[1].trim();
+                        date = fullMatch[2].trim();
+                    } else {
+                        const locationMatch = dateLocationText.match(/in\\s+([^\\s]+(?:\\s+[^\\s]+)*)/i);
+                        const dateMatch = dateLocationText.match(/on\\s+(.+)/i);
+                        if (locationMatch) location = locationMatch[1].trim();
+                        if (dateMatch) date = dateMatch[1].trim();
+                        if (!location && !date) date = dateLocationText;
+                    }
+                }
+                
+                // Extract verified purchase
+                let verifiedPurchase = false;
+                const verifiedEl = element.querySelector('[data-hook="avp-badge"]');
+                if (verifiedEl) {
+                    const verifiedText = verifiedEl.textContent.toLowerCase();
+                    verifiedPurchase = verifiedText.includes('verified') || verifiedText.includes('purchase');
+                }
+                
+                // Note: helpfulVotes field removed per user request
+                
+                if (reviewerName && reviewText) {
+                    reviews.push({
+                        reviewerName: reviewerName,
+                        rating: rating,
+                        title: reviewTitle,
+                        location: location,
+                        date: date,
+                        verifiedPurchase: verifiedPurchase,
+                        reviewText: reviewText,
+                        page: pageNumber
+                    });
+                }
+            } catch (error) {
+                console.log('Error processing review element ' + index + ':', error);
+            }
+        });
+        
+        return reviews;
+    }'''
+
+    def __init__(self, asin, product_url, headless=True, rating_filter=None, next_pages=0, save_to_file=True, page=None):
         """
         Initialize the review search component
         
@@ -19,14 +141,24 @@ class AmazonReviewSearchComponentSimple:
             headless (bool): Run browser in headless mode
             rating_filter (int): Star rating to filter by (1, 2, 3, 4, 5, or None for all reviews)
             next_pages (int): Number of additional pages to scrape (0 = only current page)
+            save_to_file (bool): Write the reviews to their own JSON file when done
+            page: Already logged-in page to use; the caller keeps ownership of its browser
         """
         self.asin = asin
         self.product_url = product_url
         self.headless = headless
         self.rating_filter = rating_filter
         self.next_pages = next_pages
-        self.browser = None
-        self.page = None
+        self.save_to_file = save_to_file
+        self.page = page
+        self.browser = page.context.browser if page else None
+        self.owns_browser = False
+        self.reviews = []
+
+    def load_product(self, asin, product_url):
+        """Point the component at another product, reusing its browser and page"""
+        self.asin = asin
+        self.product_url = product_url
         self.reviews = []
 
     def start_browser(self):
@@ -35,6 +167,7 @@ class AmazonReviewSearchComponentSimple:
         playwright = sync_playwright().start()
         self.browser = playwright.chromium.launch(headless=self.headless)
         self.page = self.browser.new_page()
+        self.owns_browser = True
         print("✅ Browser started")
 
     def close_browser(self):
@@ -88,21 +221,8 @@ class AmazonReviewSearchComponentSimple:
             self.page.evaluate("window.scrollTo(0, document.body.scrollHeight / 2)")
             time.sleep(2)
             
-            review_selectors = [
-                '#reviews-medley-footer',
-                '[data-hook="reviews-medley-footer"]',
-                'a[data-hook="see-all-reviews-link"]',
-                'a[data-hook="reviews-medley-footer"]',
-                'a:has-text("See all reviews")',
-                'a:has-text("See more reviews")',
-                '#reviews-medley-footer a',
-                '.a-link-emphasis',
-                'a[href*="#customerReviews"]',
-                '.a-link-normal[href*="reviews"]'
-            ]
-            
             review_link = None
-            for selector in review_selectors:
+            for selector in self.REVIEW_LINK_SELECTORS:
                 try:
                     element = self.page.wait_for_selector(selector, timeout=2000)
                     if element:
@@ -171,16 +291,7 @@ class AmazonReviewSearchComponentSimple:
         print(f"\n📍 Step 3.5: Filtering reviews by {self.rating_filter} star rating...")
         
         try:
-            # Map rating numbers to URL filter names
-            rating_map = {
-                5: 'five_star',
-                4: 'four_star', 
-                3: 'three_star',
-                2: 'two_star',
-                1: 'one_star'
-            }
-            
-            filter_name = rating_map.get(self.rating_filter)
+            filter_name = self.RATING_FILTER_NAMES.get(self.rating_filter)
             if not filter_name:
                 print(f"❌ Invalid rating filter: {self.rating_filter}")
                 return True
@@ -283,13 +394,7 @@ class AmazonReviewSearchComponentSimple:
                 elif approach['method'] == 'dropdown':
                     # Filter dropdown approach
                     try:
-                        dropdown_selectors = [
-                            'select[name="filterByStar"]',
-                            '#filter-info-section select',
-                            '.a-dropdown-container'
-                        ]
-                        
-                        for selector in dropdown_selectors:
+                        for selector in self.DROPDOWN_SELECTORS:
                             try:
                                 dropdown = self.page.wait_for_selector(selector, timeout=3000)
                                 if dropdown:
@@ -341,89 +446,7 @@ class AmazonReviewSearchComponentSimple:
             # Extract review data using simple working JavaScript
             print("🔍 Executing JavaScript extraction...")
             try:
-                reviews = self.page.evaluate('''() => {
-                    const reviewElements = document.querySelectorAll('[data-hook="review"]');
-                    const reviews = [];
-                    
-                    reviewElements.forEach((element, index) => {
-                        try {
-                            // Simple extraction using working selectors
-                            const nameEl = element.querySelector('.a-profile-name');
-                            const reviewerName = nameEl ? nameEl.textContent.trim() : '';
-                            
-                            const textEl = element.querySelector('[data-hook="review-body"]');
-                            const reviewText = textEl ? textEl.textContent.trim() : '';
-                            
-                            // Extract rating
-                            let rating = 0;
-                            const ratingEl = element.querySelector('.a-icon-alt');
-                            if (ratingEl) {
-                                const ratingText = ratingEl.textContent || ratingEl.getAttribute('aria-label') || '';
-                                const ratingMatch = ratingText.match(/(\\d+\\.?\\d*)\\s*out\\s*of\\s*5|(\\d+\\.?\\d*)\\s*stars?/);
-                                if (ratingMatch) {
-                                    const ratingValue = ratingMatch[1] || ratingMatch[2];
-                                    rating = parseFloat(ratingValue);
-                                }
-                            }
-                            
-                            // Extract title
-                            let reviewTitle = '';
-                            const titleEl = element.querySelector('[data-hook="review-title"]');
-                            if (titleEl) {
-                                reviewTitle = titleEl.textContent.trim();
-                                // Remove rating part and clean up newlines
-                                reviewTitle = reviewTitle.replace(/\\d+\\.?\\d*\\s*out\\s*of\\s*5\\s*stars?[\\s\\n]*/gi, '');
-                                reviewTitle = reviewTitle.replace(/\\n+/g, ' ').trim();
-                            }
-                            
-                            // Extract location and date
-                            let location = '';
-                            let date = '';
-                            const dateLocationEl = element.querySelector('[data-hook="review-date"]');
-                            if (dateLocationEl) {
-                                const dateLocationText = dateLocationEl.textContent.trim();
-                                const fullMatch = dateLocationText.match(/Reviewed\\s+in\\s+([^\\s]+(?:\\s+[^\\s]+)*)\\s+on\\s+(.+)/i);
-                                if (fullMatch) {
-                                    location = fullMatch[1].trim();
-                                    date = fullMatch[2].trim();
-                                } else {
-                                    const locationMatch = dateLocationText.match(/in\\s+([^\\s]+(?:\\s+[^\\s]+)*)/i);
-                                    const dateMatch = dateLocationText.match(/on\\s+(.+)/i);
-                                    if (locationMatch) location = locationMatch[1].trim();
-                                    if (dateMatch) date = dateMatch[1].trim();
-                                    if (!location && !date) date = dateLocationText;
-                                }
-                            }
-                            
-                            // Extract verified purchase
-                            let verifiedPurchase = false;
-                            const verifiedEl = element.querySelector('[data-hook="avp-badge"]');
-                            if (verifiedEl) {
-                                const verifiedText = verifiedEl.textContent.toLowerCase();
-                                verifiedPurchase = verifiedText.includes('verified') || verifiedText.includes('purchase');
-                            }
-                            
-                            // Note: helpfulVotes field removed per user request
-                            
-                            if (reviewerName && reviewText) {
-                                reviews.push({
-                                    reviewerName: reviewerName,
-                                    rating: rating,
-                                    title: reviewTitle,
-                                    location: location,
-                                    date: date,
-                                    verifiedPurchase: verifiedPurchase,
-                                    reviewText: reviewText,
-                                    page: ''' + str(page_number) + '''
-                                });
-                            }
-                        } catch (error) {
-                            console.log('Error processing review element ' + index + ':', error);
-                        }
-                    });
-                    
-                    return reviews;
-                }''')
+                reviews = self.page.evaluate(self.EXTRACT_REVIEWS_JS, page_number)
                 
                 print(f"🔍 JavaScript execution completed. Reviews: {len(reviews) if reviews else 'None'}")
             except Exception as js_error:
@@ -461,15 +484,8 @@ class AmazonReviewSearchComponentSimple:
             print(f"\n🔍 Looking for 'Next page' button...")
             
             # Look for next page button
-            next_selectors = [
-                '.a-pagination .a-last',
-                'li.a-last a',
-                'a[aria-label="Next page"]',
-                '.a-pagination li:last-child a'
-            ]
-            
             next_button = None
-            for selector in next_selectors:
+            for selector in self.NEXT_PAGE_SELECTORS:
                 try:
                     button = self.page.wait_for_selector(selector, timeout=3000)
                     if button and not button.get_attribute('aria-disabled'):
@@ -521,8 +537,7 @@ class AmazonReviewSearchComponentSimple:
                 filename = f"{data_dir}/reviews_{self.asin}.json"
             
             # Save reviews to file
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(reviews, f, indent=2, ensure_ascii=False)
+            write_json_atomic(filename, reviews)
             
             print(f"💾 Saved {len(reviews)} reviews to {filename}")
             return True
@@ -540,8 +555,8 @@ class AmazonReviewSearchComponentSimple:
         print("=" * 50)
         
         try:
-            # Start browser only if not already provided
-            if not self.browser or not self.page:
+            # Start browser only if no page was provided
+            if not self.page:
                 self.start_browser()
             
             # Step 1: Navigate to product page
@@ -578,7 +593,7 @@ class AmazonReviewSearchComponentSimple:
                 self.reviews = page_reviews
             
             # Save reviews to file
-            if not self.save_reviews_to_file(self.reviews):
+            if self.save_to_file and not self.save_reviews_to_file(self.reviews):
                 print("❌ Failed to save reviews to file")
                 return False
             
@@ -590,12 +605,14 @@ class AmazonReviewSearchComponentSimple:
             return False
         
         finally:
-            # Keep browser open for inspection
-            try:
-                input("Press Enter to close browser...")
-            except EOFError:
-                print("Non-interactive environment, closing browser...")
-            self.close_browser()
+            # A browser passed in by the caller stays open for its next product
+            if self.owns_browser:
+                # Keep browser open for inspection
+                try:
+                    input("Press Enter to close browser...")
+                except EOFError:
+                    print("Non-interactive environment, closing browser...")
+                self.close_browser()
 
 if __name__ == "__main__":
     # Test the component